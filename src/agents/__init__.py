@@ -6,6 +6,7 @@ Basado en GitHub Models API
 from .analysis_agent import AnalysisAgent, EvaluationInsight
 from .recommendation_agent import RecommendationAgent, PersonalizedRecommendation, LearningPath
 from .monitoring_agent import MonitoringAgent, Alert, StudentProgress
+from .prompt_cache import PromptCache
 
 __all__ = [
     'AnalysisAgent',
@@ -15,5 +16,6 @@ __all__ = [
     'LearningPath',
     'MonitoringAgent',
     'Alert',
-    'StudentProgress'
+    'StudentProgress',
+    'PromptCache'
 ]
@@ -5,11 +5,14 @@ Basado en la configuración de GitHub Models del proyecto de curso
 """
 
 import os
+import re
 import json
 import sys
-from typing import List, Dict, Any
-from dataclasses import dataclass
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, asdict
 from datetime import datetime
+import httpx
 import openai
 import requests
 from dotenv import load_dotenv
@@ -18,19 +21,85 @@ from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from config import Config
+from agents.prompt_cache import PromptCache
 
 # Cargar variables de entorno
 load_dotenv()
 
-@dataclass
+# Inicio candidato de un arreglo JSON de objetos: "[" seguido de "{" o "]"
+_JSON_ARRAY_START = re.compile(r'\[\s*[{\]]')
+_JSON_DECODER = json.JSONDecoder()
+
+# Herramienta para salida estructurada: el modelo entrega los insights como
+# argumentos JSON de una llamada a función en vez de texto libre
+INSIGHT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_insights",
+        "description": "Entrega los insights del análisis de evaluaciones.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "insights": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "tipo": {"type": "string", "enum": ["tendencia", "problema_comun", "recomendacion"]},
+                            "titulo": {"type": "string"},
+                            "descripcion": {"type": "string"},
+                            "criterios_afectados": {"type": "array", "items": {"type": "string"}},
+                            "gravedad": {"type": "string", "enum": ["baja", "media", "alta"]},
+                            "evidencias": {"type": "array", "items": {"type": "string"}}
+                        },
+                        "required": ["tipo", "titulo", "descripcion", "criterios_afectados", "gravedad", "evidencias"]
+                    }
+                }
+            },
+            "required": ["insights"]
+        }
+    }
+}
+INSIGHT_TOOL_CHOICE = {"type": "function", "function": {"name": "emit_insights"}}
+
+def _create_http_client() -> httpx.Client:
+    """Crea un cliente HTTP con pool de conexiones keep-alive para el cliente OpenAI.
+    
+    Usa HTTP/2 (multiplexación) solo si el paquete opcional h2 está instalado.
+    """
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+        timeout=httpx.Timeout(60.0)
+    )
+
+@dataclass(frozen=True)
 class EvaluationInsight:
     """Insight generado por el agente de análisis."""
+    # __slots__ explícito (compatible con Python 3.8): sin __dict__ por instancia
+    __slots__ = ('tipo', 'titulo', 'descripcion', 'criterios_afectados', 'gravedad', 'evidencias')
+    
     tipo: str  # "tendencia", "problema_comun", "recomendacion"
     titulo: str
     descripcion: str
     criterios_afectados: List[str]
     gravedad: str  # "baja", "media", "alta"
     evidencias: List[str]
+    
+    def __getstate__(self):
+        """Estado para copy/pickle: los valores en el orden de __slots__."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        """Restaura el estado sin pasar por el __setattr__ congelado."""
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
 class AnalysisAgent:
     """Agente inteligente para análisis de evaluaciones."""
@@ -46,7 +115,8 @@ class AnalysisAgent:
         if self.provider == "github":
             self.client = openai.OpenAI(
                 base_url=Config.LLM_PROVIDERS["github"]["base_url"],
-                api_key=Config.GITHUB_TOKEN
+                api_key=Config.GITHUB_TOKEN,
+                http_client=_create_http_client()
             )
             self.model = "gpt-4o-mini"
         elif self.provider == "ollama":
@@ -56,15 +126,28 @@ class AnalysisAgent:
             # Fallback a GitHub Models
             self.client = openai.OpenAI(
                 base_url=Config.LLM_PROVIDERS["github"]["base_url"],
-                api_key=Config.GITHUB_TOKEN
+                api_key=Config.GITHUB_TOKEN,
+                http_client=_create_http_client()
             )
             self.model = "gpt-4o-mini"
         
+        # Caché persistente de insights por prompt
+        self.cache = PromptCache()
+        
     def analyze_evaluation_trends(self, evaluations: List[Dict]) -> List[EvaluationInsight]:
         """Analiza tendencias en múltiples evaluaciones."""
         
+        # Sin evaluaciones no hay nada que analizar (ni promedios que calcular)
+        if not evaluations:
+            return []
+        
         prompt = self._build_trend_analysis_prompt(evaluations)
         
+        cache_key = self._cache_key("tendencias", prompt)
+        cached = self._get_cached_insights(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             if self.provider == "github":
                 response = self.client.chat.completions.create(
@@ -76,9 +159,11 @@ class AnalysisAgent:
                         },
                         {"role": "user", "content": prompt}
                     ],
-                    temperature=0.3
+                    temperature=0.3,
+                    tools=[INSIGHT_TOOL],
+                    tool_choice=INSIGHT_TOOL_CHOICE
                 )
-                insights_text = response.choices[0].message.content
+                insights = self._parse_message_insights(response.choices[0].message)
                 
             elif self.provider == "ollama":
                 # Ollama API call
@@ -99,11 +184,11 @@ class AnalysisAgent:
                 )
                 
                 if response.status_code == 200:
-                    insights_text = response.json()["response"]
+                    insights = self._parse_insights(response.json()["response"])
                 else:
                     raise Exception(f"Error de Ollama: {response.status_code} - {response.text}")
             
-            return self._parse_insights(insights_text)
+            return self._store_insights(cache_key, insights)
             
         except Exception as e:
             print(f"Error en análisis de tendencias: {e}")
@@ -112,8 +197,16 @@ class AnalysisAgent:
     def identify_common_issues(self, evaluations: List[Dict]) -> List[EvaluationInsight]:
         """Identifica problemas comunes en las evaluaciones."""
         
+        if not evaluations:
+            return []
+        
         prompt = self._build_issues_analysis_prompt(evaluations)
         
+        cache_key = self._cache_key("problemas_comunes", prompt)
+        cached = self._get_cached_insights(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -124,20 +217,33 @@ class AnalysisAgent:
                     },
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2
+                temperature=0,
+                seed=0,
+                tools=[INSIGHT_TOOL],
+                tool_choice=INSIGHT_TOOL_CHOICE
             )
             
-            issues_text = response.choices[0].message.content
-            return self._parse_insights(issues_text)
+            insights = self._parse_message_insights(response.choices[0].message)
+            return self._store_insights(cache_key, insights)
             
         except Exception as e:
             print(f"Error identificando problemas comunes: {e}")
             return []
     
-    def generate_improvement_recommendations(self, evaluation: Dict) -> List[EvaluationInsight]:
-        """Genera recomendaciones específicas para una evaluación."""
+    def generate_improvement_recommendations(self, evaluation: Dict,
+                                             evaluation_json: Optional[str] = None) -> List[EvaluationInsight]:
+        """Genera recomendaciones específicas para una evaluación.
+        
+        evaluation_json, si se entrega, es la evaluación ya serializada (JSON con
+        sangría de 2) y se usa tal cual en el prompt.
+        """
+        
+        prompt = self._build_recommendation_prompt(evaluation, evaluation_json)
         
-        prompt = self._build_recommendation_prompt(evaluation)
+        cache_key = self._cache_key("recomendaciones", prompt)
+        cached = self._get_cached_insights(cache_key)
+        if cached is not None:
+            return cached
         
         try:
             response = self.client.chat.completions.create(
@@ -149,18 +255,37 @@ class AnalysisAgent:
                     },
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.4
+                temperature=0.4,
+                tools=[INSIGHT_TOOL],
+                tool_choice=INSIGHT_TOOL_CHOICE
             )
             
-            recommendations_text = response.choices[0].message.content
-            return self._parse_insights(recommendations_text)
+            insights = self._parse_message_insights(response.choices[0].message)
+            return self._store_insights(cache_key, insights)
             
         except Exception as e:
             print(f"Error generando recomendaciones: {e}")
             return []
     
+    def _cache_key(self, operacion: str, prompt: str) -> str:
+        """Clave de caché: proveedor, modelo, operación y prompt completo."""
+        return PromptCache.make_key(self.provider, self.model, operacion, prompt)
+    
+    def _get_cached_insights(self, cache_key: str) -> Optional[List[EvaluationInsight]]:
+        """Devuelve los insights cacheados para la clave, si existen."""
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        return self._build_insights(json.loads(cached))
+    
+    def _store_insights(self, cache_key: str, insights: List[EvaluationInsight]) -> List[EvaluationInsight]:
+        """Guarda en caché los insights no vacíos y los devuelve."""
+        if insights:
+            self.cache.set(cache_key, json.dumps([asdict(i) for i in insights], ensure_ascii=False))
+        return insights
+    
     def _build_trend_analysis_prompt(self, evaluations: List[Dict]) -> str:
-        """Construye prompt para análisis de tendencias."""
+        """Construye prompt para análisis de tendencias (instrucciones primero, datos al final)."""
         
         # Preparar datos para análisis
         criterios_stats = {}
@@ -193,12 +318,7 @@ ESTADÍSTICAS POR CRITERIO:
             stats_text += f"- {criterio}: {promedio:.1f}% promedio\n"
         
         prompt = f"""
-Analiza las siguientes tendencias en las evaluaciones de proyectos de Machine Learning:
-
-{stats_text}
-
-EVALUACIONES DETALLADAS:
-{json.dumps(evaluations, indent=2, ensure_ascii=False)}
+Analiza las tendencias en las evaluaciones de proyectos de Machine Learning que se entregan al final.
 
 INSTRUCCIONES:
 1. Identifica 3-5 tendencias principales
@@ -217,16 +337,25 @@ FORMATO DE RESPUESTA (JSON):
         "evidencias": ["evidencia1", "evidencia2"]
     }}
 ]
+
+{stats_text}
+
+EVALUACIONES DETALLADAS:
+{json.dumps(evaluations, indent=2, ensure_ascii=False)}
 """
         return prompt
     
     def _build_issues_analysis_prompt(self, evaluations: List[Dict]) -> str:
-        """Construye prompt para análisis de problemas comunes."""
+        """Construye prompt para análisis de problemas comunes.
+        
+        Las instrucciones y el formato van primero y las evaluaciones al final:
+        así el prefijo del prompt es idéntico entre llamadas y el proveedor
+        puede reutilizarlo (prompt caching). No interponer datos variables
+        antes del bloque de instrucciones.
+        """
         
         prompt = f"""
-Analiza los problemas más comunes en estas evaluaciones de proyectos de Machine Learning:
-
-{json.dumps(evaluations, indent=2, ensure_ascii=False)}
+Analiza los problemas más comunes en las evaluaciones de proyectos de Machine Learning que se entregan al final.
 
 INSTRUCCIONES:
 1. Identifica los 5 problemas más recurrentes
@@ -245,16 +374,17 @@ FORMATO DE RESPUESTA (JSON):
         "evidencias": ["% de estudiantes afectados", "ejemplos específicos"]
     }}
 ]
+
+EVALUACIONES:
+{json.dumps(evaluations, indent=2, ensure_ascii=False)}
 """
         return prompt
     
-    def _build_recommendation_prompt(self, evaluation: Dict) -> str:
-        """Construye prompt para recomendaciones específicas."""
+    def _build_recommendation_prompt(self, evaluation: Dict, evaluation_json: Optional[str] = None) -> str:
+        """Construye prompt para recomendaciones específicas (instrucciones primero, evaluación al final)."""
         
         prompt = f"""
-Genera recomendaciones específicas para mejorar este proyecto de Machine Learning:
-
-{json.dumps(evaluation, indent=2, ensure_ascii=False)}
+Genera recomendaciones específicas para mejorar el proyecto de Machine Learning cuya evaluación se entrega al final.
 
 INSTRUCCIONES:
 1. Enfócate en los criterios con menor puntuación
@@ -273,37 +403,68 @@ FORMATO DE RESPUESTA (JSON):
         "evidencias": ["puntuación actual", "área de mejora"]
     }}
 ]
+
+EVALUACIÓN:
+{evaluation_json or json.dumps(evaluation, indent=2, ensure_ascii=False)}
 """
         return prompt
     
+    def _parse_message_insights(self, message) -> List[EvaluationInsight]:
+        """Obtiene los insights de un mensaje de chat, priorizando la llamada a emit_insights."""
+        if message.tool_calls:
+            try:
+                arguments = json.loads(message.tool_calls[0].function.arguments)
+                return self._build_insights(arguments.get('insights', []))
+            except Exception as e:
+                print(f"Error parseando insights estructurados: {e}")
+                return []
+        
+        # El modelo respondió en texto libre
+        return self._parse_insights(message.content or "")
+    
     def _parse_insights(self, insights_text: str) -> List[EvaluationInsight]:
         """Parsea la respuesta del LLM en objetos EvaluationInsight."""
         try:
-            # Buscar JSON en la respuesta
-            start = insights_text.find('[')
-            end = insights_text.rfind(']') + 1
-            json_str = insights_text[start:end]
-            
-            insights_data = json.loads(json_str)
-            insights = []
-            
-            for insight_data in insights_data:
-                insight = EvaluationInsight(
-                    tipo=insight_data.get('tipo', ''),
-                    titulo=insight_data.get('titulo', ''),
-                    descripcion=insight_data.get('descripcion', ''),
-                    criterios_afectados=insight_data.get('criterios_afectados', []),
-                    gravedad=insight_data.get('gravedad', 'media'),
-                    evidencias=insight_data.get('evidencias', [])
-                )
-                insights.append(insight)
-            
-            return insights
+            insights_data = self._extract_json_array(insights_text)
+            return self._build_insights(insights_data)
             
         except Exception as e:
             print(f"Error parseando insights: {e}")
             return []
     
+    def _build_insights(self, insights_data: List[Dict]) -> List[EvaluationInsight]:
+        """Construye objetos EvaluationInsight desde diccionarios."""
+        insights = []
+        
+        for insight_data in insights_data:
+            insight = EvaluationInsight(
+                tipo=insight_data.get('tipo', ''),
+                titulo=insight_data.get('titulo', ''),
+                descripcion=insight_data.get('descripcion', ''),
+                criterios_afectados=insight_data.get('criterios_afectados', []),
+                gravedad=insight_data.get('gravedad', 'media'),
+                evidencias=insight_data.get('evidencias', [])
+            )
+            insights.append(insight)
+        
+        return insights
+    
+    def _extract_json_array(self, text: str) -> List[Dict]:
+        """Extrae el primer arreglo JSON válido de la respuesta del LLM.
+        
+        Prueba cada "[" candidato con raw_decode, de modo que corchetes sueltos
+        en texto o bloques de código no rompan el parseo.
+        """
+        for match in _JSON_ARRAY_START.finditer(text):
+            try:
+                data, _ = _JSON_DECODER.raw_decode(text, match.start())
+            except ValueError:
+                continue
+            if isinstance(data, list):
+                return data
+        
+        raise ValueError("No se encontró un arreglo JSON en la respuesta")
+    
     def generate_summary_report(self, insights: List[EvaluationInsight]) -> str:
         """Genera un reporte resumen de los insights."""
         
@@ -315,10 +476,8 @@ FORMATO DE RESPUESTA (JSON):
         report += f"**Total Insights:** {len(insights)}\n\n"
         
         # Agrupar por tipo
-        by_type = {}
+        by_type = defaultdict(list)
         for insight in insights:
-            if insight.tipo not in by_type:
-                by_type[insight.tipo] = []
             by_type[insight.tipo].append(insight)
         
         for tipo, insights_list in by_type.items():
@@ -5,11 +5,18 @@ Monitorea el progreso de estudiantes y detecta patrones preocupantes
 """
 
 import os
+import re
 import json
 import sys
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+import numpy as np
 import openai
 import requests
 from dotenv import load_dotenv
@@ -18,13 +25,70 @@ from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from config import Config
+from agents.prompt_cache import PromptCache
 
 # Cargar variables de entorno
 load_dotenv()
 
+# MinHash/LSH es opcional: sin datasketch se comparan todos los pares
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = MinHashLSH = None
+
+# Numba es opcional: sin él el clasificador de puntuaciones corre en NumPy puro
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _classify_scores(scores):
+    """Máscaras de áreas fuertes (>= 80) y débiles (< 60) para un arreglo de puntuaciones."""
+    return scores >= 80, scores < 60
+
+if njit is not None:
+    _classify_scores = njit(cache=True)(_classify_scores)
+
+# Cliente asíncrono de Ollama (opcional): sin él los lotes se resuelven en serie
+try:
+    from ollama import AsyncClient
+except ImportError:
+    AsyncClient = None
+
+# Tokens de retroalimentación: palabras sin puntuación, sin palabras vacías del español
+_TOKEN_RE = re.compile(r"[a-záéíóúüñ0-9]+")
+_STOPWORDS = frozenset((
+    "a", "al", "como", "con", "de", "del", "e", "el", "en", "es", "esta", "este",
+    "la", "las", "le", "lo", "los", "mas", "más", "muy", "ni", "no", "o", "para",
+    "pero", "por", "que", "se", "si", "sin", "su", "sus", "u", "un", "una", "y"
+))
+
+def _tokenize_feedback(texto: str) -> frozenset:
+    """Conjunto de palabras significativas de una retroalimentación."""
+    return frozenset(t for t in _TOKEN_RE.findall(texto.lower()) if t not in _STOPWORDS)
+
+# Grupos más pequeños se comparan par a par (el costo de LSH no se justifica)
+LSH_MIN_GROUP_SIZE = 50
+LSH_NUM_PERM = 128
+
+# Notas en float64: con float32, diferencias como 4.2-4.0 o 5.0-4.0 quedan del
+# otro lado de los umbrales (0.2, 1.0) y cambian tendencias y alertas
+NOTA_DTYPE = np.float64
+
+# Cohortes desde este tamaño analizan estudiantes en paralelo
+PARALLEL_MIN_STUDENTS = 64
+
+# Secciones del reporte: severidades no críticas en orden y emojis de tendencia
+_SEVERITY_SECTIONS = (("alta", "🟠"), ("media", "🟡"), ("baja", "🟢"))
+_TREND_EMOJI = {"mejorando": "📈", "estable": "➡️", "empeorando": "📉"}
+
 @dataclass
 class Alert:
     """Alerta generada por el agente de monitoreo."""
+    # __slots__ explícito (compatible con Python 3.8): sin __dict__ por instancia
+    __slots__ = ('tipo', 'severidad', 'titulo', 'descripcion', 'estudiante',
+                 'evidencias', 'recomendaciones', 'timestamp')
+    
     tipo: str  # "progreso", "plagio", "riesgo_academico", "mejora"
     severidad: str  # "baja", "media", "alta", "critica"
     titulo: str
@@ -37,6 +101,9 @@ class Alert:
 @dataclass
 class StudentProgress:
     """Progreso de un estudiante a lo largo del tiempo."""
+    __slots__ = ('estudiante_id', 'nombre', 'evaluaciones', 'tendencia', 'nota_promedio',
+                 'areas_fuertes', 'areas_debiles', 'ultima_evaluacion')
+    
     estudiante_id: str
     nombre: str
     evaluaciones: List[Dict]
@@ -47,7 +114,23 @@ class StudentProgress:
     ultima_evaluacion: datetime
 
 class MonitoringAgent:
-    """Agente que monitorea el progreso y detecta alertas."""
+    """Agente que monitorea el progreso y detecta alertas.
+    
+    Con Ollama, los prompts por estudiante se envían en lote y de forma
+    concurrente (chat_batch). El servidor atiende en paralelo tantas
+    solicitudes como indique OLLAMA_NUM_PARALLEL, y OLLAMA_MAX_LOADED_MODELS
+    limita los modelos cargados a la vez; ambas variables se configuran al
+    iniciar `ollama serve`.
+    """
+    
+    # Rango de severidad para ordenar alertas (mayor = más grave)
+    _SEVERITY_RANK = {"critica": 4, "alta": 3, "media": 2, "baja": 1}
+    
+    # Hilos para el lote cuando ya hay un event loop en ejecución
+    MAX_BATCH_WORKERS = 8
+    
+    # Máximo de respuestas memorizadas en el proceso
+    RESPONSE_MEMO_SIZE = 256
     
     def __init__(self):
         """Inicializa el agente con configuración centralizada."""
@@ -82,27 +165,147 @@ class MonitoringAgent:
             "sin_progreso": 0.2,  # Diferencia mínima esperada
             "plagio_similarity": 0.8  # Similitud entre proyectos
         }
+        
+        # Caché de respuestas LLM: en memoria para el proceso y SQLite entre ejecuciones
+        self._llm_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.cache = PromptCache()
+    
+    def _chat(self, messages: List[Dict], **kwargs) -> str:
+        """Llama al LLM configurado reutilizando respuestas de prompts idénticos."""
+        
+        key = PromptCache.make_key(self.provider, self.model, messages, kwargs)
+        cached = self._get_cached_response(key)
+        if cached is not None:
+            return cached
+        
+        if self.client is not None:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                **kwargs
+            )
+            content = response.choices[0].message.content
+        else:
+            response = requests.post(
+                f"{self.ollama_url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": "\n\n".join(m["content"] for m in messages),
+                    "stream": False,
+                    "options": kwargs
+                },
+                timeout=120
+            )
+            if response.status_code != 200:
+                raise Exception(f"Error de Ollama: {response.status_code} - {response.text}")
+            content = response.json()["response"]
+        
+        self._store_response(key, content)
+        return content
     
-    def monitor_student_progress(self, student_evaluations: List[Dict]) -> StudentProgress:
+    def chat_batch(self, prompts: List[str], **kwargs) -> List[str]:
+        """Resuelve varios prompts; con Ollama los pendientes se envían en paralelo."""
+        
+        batch = [[{"role": "user", "content": prompt}] for prompt in prompts]
+        if self.client is not None or AsyncClient is None:
+            return [self._chat(messages, **kwargs) for messages in batch]
+        
+        keys = [PromptCache.make_key(self.provider, self.model, messages, kwargs) for messages in batch]
+        
+        # Un solo envío por prompt distinto que no esté en caché
+        results = {}
+        pending = {}
+        for key, messages in zip(keys, batch):
+            if key in results or key in pending:
+                continue
+            cached = self._get_cached_response(key)
+            if cached is None:
+                pending[key] = messages
+            else:
+                results[key] = cached
+        
+        if pending:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                responses = asyncio.run(self._analyze_batch(list(pending.values()), **kwargs))
+                for key, content in zip(pending, responses):
+                    self._store_response(key, content)
+            else:
+                # asyncio.run no funciona dentro de un loop: _chat guarda cada respuesta
+                with ThreadPoolExecutor(max_workers=min(self.MAX_BATCH_WORKERS, len(pending))) as executor:
+                    responses = list(executor.map(lambda messages: self._chat(messages, **kwargs), pending.values()))
+            results.update(zip(pending, responses))
+        
+        return [results[key] for key in keys]
+    
+    async def _analyze_batch(self, batch: List[List[Dict]], **kwargs) -> List[str]:
+        """Envía todas las conversaciones a Ollama a la vez y espera las respuestas."""
+        
+        async with AsyncClient(host=self.ollama_url) as client:
+            tasks = [
+                client.chat(model=self.model, messages=messages, options=kwargs)
+                for messages in batch
+            ]
+            responses = await asyncio.gather(*tasks)
+        return [response["message"]["content"] for response in responses]
+    
+    def _get_cached_response(self, key: str) -> Optional[str]:
+        """Busca la respuesta en memoria y luego en la caché persistente."""
+        with self._memo_lock:
+            cached = self._llm_cache.get(key)
+            if cached is not None:
+                self._llm_cache.move_to_end(key)
+                return cached
+        
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._memoize(key, cached)
+        return cached
+    
+    def _memoize(self, key: str, content: str):
+        """Guarda la respuesta en memoria descartando la menos usada si hace falta."""
+        with self._memo_lock:
+            self._llm_cache[key] = content
+            self._llm_cache.move_to_end(key)
+            if len(self._llm_cache) > self.RESPONSE_MEMO_SIZE:
+                self._llm_cache.popitem(last=False)
+    
+    def _store_response(self, key: str, content: Optional[str]):
+        """Guarda la respuesta en memoria y en la caché persistente.
+        
+        Una respuesta sin texto (content None) no se guarda: la columna de
+        SQLite es NOT NULL y además conviene reintentar el prompt.
+        """
+        if not isinstance(content, str):
+            return
+        self._memoize(key, content)
+        self.cache.set(key, content)
+    
+    def monitor_student_progress(self, student_evaluations: List[Dict], now: Optional[datetime] = None) -> StudentProgress:
         """Monitorea el progreso de un estudiante específico."""
         
         if not student_evaluations:
             return None
         
-        # Ordenar evaluaciones por fecha
-        sorted_evaluations = sorted(
-            student_evaluations, 
-            key=lambda x: x.get('fecha_evaluacion', ''),
-            reverse=True
+        n = len(student_evaluations)
+        fechas = np.array([e.get('fecha_evaluacion', '') for e in student_evaluations])
+        notas = np.fromiter(
+            (e.get('nota_final', 0) for e in student_evaluations), dtype=NOTA_DTYPE, count=n
         )
         
+        # Más reciente y más antigua en una pasada; ante fechas iguales se toma
+        # la primera y la última aparición, como en un sorted estable descendente
+        latest = int(np.argmax(fechas))
+        oldest = (n - 1) - int(np.argmin(fechas[::-1]))
+        
         # Calcular métricas
-        notas = [e.get('nota_final', 0) for e in sorted_evaluations]
-        nota_promedio = sum(notas) / len(notas)
+        nota_promedio = float(notas.mean())
         
         # Determinar tendencia
-        if len(notas) >= 2:
-            diferencia = notas[0] - notas[-1]  # Última vs primera
+        if n >= 2:
+            diferencia = float(notas[latest] - notas[oldest])  # Última vs primera
             if diferencia > self.thresholds["sin_progreso"]:
                 tendencia = "mejorando"
             elif diferencia < -self.thresholds["sin_progreso"]:
@@ -113,67 +316,124 @@ class MonitoringAgent:
             tendencia = "estable"
         
         # Identificar áreas fuertes y débiles
-        areas_fuertes, areas_debiles = self._analyze_criteria_strengths(sorted_evaluations[0])
+        ultima = student_evaluations[latest]
+        areas_fuertes, areas_debiles = self._analyze_criteria_strengths(ultima)
+        
+        # El historial se expone ordenado por fecha descendente; argsort estable
+        # sobre el arreglo invertido conserva el orden original entre empates
+        order = (n - 1) - np.argsort(fechas[::-1], kind='stable')[::-1]
+        sorted_evaluations = [student_evaluations[i] for i in order]
+        
+        # Sin fecha registrada se usa el instante actual (compartido si se entrega)
+        fecha = ultima.get('fecha_evaluacion')
+        if fecha:
+            ultima_evaluacion = datetime.fromisoformat(fecha)
+        else:
+            ultima_evaluacion = now or datetime.now()
         
         return StudentProgress(
-            estudiante_id=sorted_evaluations[0].get('estudiante_id', ''),
-            nombre=sorted_evaluations[0].get('estudiante', ''),
+            estudiante_id=ultima.get('estudiante_id', ''),
+            nombre=ultima.get('estudiante', ''),
             evaluaciones=sorted_evaluations,
             tendencia=tendencia,
             nota_promedio=nota_promedio,
             areas_fuertes=areas_fuertes,
             areas_debiles=areas_debiles,
-            ultima_evaluacion=datetime.fromisoformat(
-                sorted_evaluations[0].get('fecha_evaluacion', datetime.now().isoformat())
-            )
+            ultima_evaluacion=ultima_evaluacion
         )
     
     def generate_alerts(self, all_evaluations: List[Dict]) -> List[Alert]:
         """Genera alertas basadas en todas las evaluaciones."""
         
         alerts = []
+        now = datetime.now()
+        
+        # Agrupar por estudiante (orden de aparición) y ordenar cada grupo por fecha
+        # descendente en una sola pasada vectorizada sobre arreglos paralelos
+        by_student = []
+        if all_evaluations:
+            soa = self._to_soa(all_evaluations)
+            fecha_rank = np.unique(soa['fecha'], return_inverse=True)[1].ravel()
+            order = np.lexsort((-fecha_rank, soa['student']))  # lexsort es estable
+            grupos = soa['student'][order]
+            starts = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+            
+            for indices in np.split(order, starts[1:]):
+                by_student.append((
+                    soa['student_ids'][soa['student'][indices[0]]],
+                    [all_evaluations[i] for i in indices],
+                    soa['nota'][indices[:3]]
+                ))
         
-        # Agrupar evaluaciones por estudiante
-        by_student = {}
-        for eval_data in all_evaluations:
-            student_id = eval_data.get('estudiante_id', eval_data.get('repositorio', ''))
-            if student_id not in by_student:
-                by_student[student_id] = []
-            by_student[student_id].append(eval_data)
-        
-        # Analizar cada estudiante
-        for student_id, evaluations in by_student.items():
-            student_alerts = self._analyze_student_alerts(student_id, evaluations)
-            alerts.extend(student_alerts)
+        # Analizar cada estudiante (map conserva el orden de los estudiantes)
+        if len(by_student) >= PARALLEL_MIN_STUDENTS:
+            with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1)) as executor:
+                results = executor.map(
+                    lambda item: self._analyze_student_alerts(item[0], item[1], now, item[2]),
+                    by_student
+                )
+                for student_alerts in results:
+                    alerts.extend(student_alerts)
+        else:
+            for student_id, evaluations, notas in by_student:
+                student_alerts = self._analyze_student_alerts(student_id, evaluations, now, notas)
+                alerts.extend(student_alerts)
         
         # Detectar patrones de plagio
-        plagiarism_alerts = self._detect_plagiarism_patterns(all_evaluations)
+        plagiarism_alerts = self._detect_plagiarism_patterns(all_evaluations, now)
         alerts.extend(plagiarism_alerts)
         
-        # Ordenar por severidad
-        severity_order = {"critica": 4, "alta": 3, "media": 2, "baja": 1}
-        alerts.sort(key=lambda x: severity_order.get(x.severidad, 0), reverse=True)
+        # Ordenar por severidad: solo hay cinco rangos, basta un bucket sort estable
+        buckets = ([], [], [], [], [])
+        for alert in alerts:
+            buckets[self._SEVERITY_RANK.get(alert.severidad, 0)].append(alert)
         
-        return alerts
+        return buckets[4] + buckets[3] + buckets[2] + buckets[1] + buckets[0]
     
-    def _analyze_student_alerts(self, student_id: str, evaluations: List[Dict]) -> List[Alert]:
-        """Analiza alertas para un estudiante específico."""
+    def _to_soa(self, all_evaluations: List[Dict]) -> Dict[str, Any]:
+        """Convierte la lista de evaluaciones (AoS) en arreglos paralelos (SoA).
+        
+        'student' guarda un código entero por estudiante en orden de aparición;
+        'student_ids' permite recuperar el identificador original a partir del código.
+        """
+        
+        n = len(all_evaluations)
+        codes = {}
+        student = np.fromiter(
+            (codes.setdefault(e.get('estudiante_id', e.get('repositorio', '')), len(codes))
+             for e in all_evaluations),
+            dtype=np.intp, count=n
+        )
+        nota = np.fromiter(
+            (e.get('nota_final', 0) for e in all_evaluations), dtype=NOTA_DTYPE, count=n
+        )
+        fecha = np.array([e.get('fecha_evaluacion', '') for e in all_evaluations])
+        
+        return {'student': student, 'student_ids': list(codes), 'nota': nota, 'fecha': fecha}
+    
+    def _analyze_student_alerts(self, student_id: str, sorted_evaluations: List[Dict],
+                                now: Optional[datetime] = None, notas: Optional[np.ndarray] = None) -> List[Alert]:
+        """Analiza alertas para un estudiante específico.
+        
+        Las evaluaciones deben venir ordenadas por fecha descendente (generate_alerts lo garantiza).
+        notas, si se entrega, contiene las notas de las tres evaluaciones más recientes.
+        """
         
         alerts = []
+        now = now or datetime.now()
         
-        if not evaluations:
+        if not sorted_evaluations:
             return alerts
         
-        # Ordenar por fecha
-        sorted_evaluations = sorted(
-            evaluations, 
-            key=lambda x: x.get('fecha_evaluacion', ''),
-            reverse=True
-        )
+        student_name = sorted_evaluations[0].get('estudiante', student_id)
         
-        latest_eval = sorted_evaluations[0]
-        student_name = latest_eval.get('estudiante', student_id)
-        latest_nota = latest_eval.get('nota_final', 0)
+        # Las reglas solo miran las tres evaluaciones más recientes: extraerlas una vez
+        if notas is None:
+            recientes = sorted_evaluations[:3]
+            notas = np.fromiter(
+                (e.get('nota_final', 0) for e in recientes), dtype=NOTA_DTYPE, count=len(recientes)
+            )
+        latest_nota = float(notas[0])
         
         # Alerta por nota muy baja
         if latest_nota < self.thresholds["nota_muy_baja"]:
@@ -189,7 +449,7 @@ class MonitoringAgent:
                     "Revisar dificultades específicas",
                     "Considerar apoyo académico adicional"
                 ],
-                timestamp=datetime.now()
+                timestamp=now
             ))
         
         # Alerta por nota baja
@@ -206,12 +466,12 @@ class MonitoringAgent:
                     "Identificar áreas de mejora específicas",
                     "Proporcionar recursos adicionales"
                 ],
-                timestamp=datetime.now()
+                timestamp=now
             ))
         
         # Alerta por degradación rápida
-        if len(sorted_evaluations) >= 2:
-            nota_anterior = sorted_evaluations[1].get('nota_final', 0)
+        if len(notas) >= 2:
+            nota_anterior = float(notas[1])
             diferencia = nota_anterior - latest_nota
             
             if diferencia > self.thresholds["degradacion_rapida"]:
@@ -231,13 +491,12 @@ class MonitoringAgent:
                         "Revisar carga de trabajo",
                         "Ofrecer apoyo adicional"
                     ],
-                    timestamp=datetime.now()
+                    timestamp=now
                 ))
         
         # Alerta por falta de progreso
-        if len(sorted_evaluations) >= 3:
-            notas_recientes = [e.get('nota_final', 0) for e in sorted_evaluations[:3]]
-            variacion = max(notas_recientes) - min(notas_recientes)
+        if len(notas) >= 3:
+            variacion = float(np.ptp(notas))
             
             if variacion < self.thresholds["sin_progreso"]:
                 alerts.append(Alert(
@@ -247,7 +506,7 @@ class MonitoringAgent:
                     descripcion=f"El estudiante {student_name} muestra poco progreso en las últimas evaluaciones.",
                     estudiante=student_name,
                     evidencias=[
-                        f"Notas recientes: {', '.join([f'{n:.1f}' for n in notas_recientes])}",
+                        f"Notas recientes: {', '.join([f'{n:.1f}' for n in notas])}",
                         f"Variación: {variacion:.1f}"
                     ],
                     recomendaciones=[
@@ -255,31 +514,31 @@ class MonitoringAgent:
                         "Ajustar estrategia de enseñanza",
                         "Proporcionar desafíos adicionales"
                     ],
-                    timestamp=datetime.now()
+                    timestamp=now
                 ))
         
         return alerts
     
-    def _detect_plagiarism_patterns(self, all_evaluations: List[Dict]) -> List[Alert]:
+    def _detect_plagiarism_patterns(self, all_evaluations: List[Dict], now: Optional[datetime] = None) -> List[Alert]:
         """Detecta posibles patrones de plagio."""
         
         alerts = []
+        now = now or datetime.now()
         
         # Agrupar por criterios y buscar similitudes
-        criteria_groups = {}
+        criteria_groups = defaultdict(list)
         
         for eval_data in all_evaluations:
             for criterio in eval_data.get('criterios', []):
                 criterio_name = criterio.get('criterio', '')
                 retroalimentacion = criterio.get('retroalimentacion', '')
                 
-                if criterio_name not in criteria_groups:
-                    criteria_groups[criterio_name] = []
-                
                 criteria_groups[criterio_name].append({
                     'estudiante': eval_data.get('estudiante', ''),
                     'retroalimentacion': retroalimentacion,
-                    'evaluacion': eval_data
+                    'evaluacion': eval_data,
+                    # Tokenizado una sola vez; se reutiliza en cada comparación
+                    '_words': _tokenize_feedback(retroalimentacion)
                 })
         
         # Buscar similitudes en retroalimentaciones
@@ -288,7 +547,9 @@ class MonitoringAgent:
                 continue
             
             # Comparar retroalimentaciones (simplificado)
-            similarities = self._find_text_similarities(evaluaciones)
+            similarities = self._find_text_similarities(
+                evaluaciones, min_similarity=self.thresholds["plagio_similarity"]
+            )
             
             for sim in similarities:
                 if sim['similarity'] > self.thresholds["plagio_similarity"]:
@@ -308,141 +569,178 @@ class MonitoringAgent:
                             "Verificar originalidad del trabajo",
                             "Aplicar políticas de integridad académica"
                         ],
-                        timestamp=datetime.now()
+                        timestamp=now
                     ))
         
         return alerts
     
-    def _find_text_similarities(self, evaluations: List[Dict]) -> List[Dict]:
-        """Encuentra similitudes entre textos (implementación simplificada)."""
+    def _find_text_similarities(self, evaluations: List[Dict], min_similarity: float = 0.5) -> List[Dict]:
+        """Encuentra similitudes entre textos (implementación simplificada).
+        
+        Cada elemento debe traer '_words' precalculado por _detect_plagiarism_patterns.
+        Solo se reportan pares con similitud mayor a min_similarity.
+        """
         
         similarities = []
+        word_sets = [e['_words'] for e in evaluations]
+        sizes = [len(words) for words in word_sets]
         
-        for i, eval1 in enumerate(evaluations):
-            for j, eval2 in enumerate(evaluations[i+1:], i+1):
-                text1 = eval1['retroalimentacion'].lower()
-                text2 = eval2['retroalimentacion'].lower()
-                
-                # Similitud básica por palabras comunes
-                words1 = set(text1.split())
-                words2 = set(text2.split())
-                
-                if len(words1) > 0 and len(words2) > 0:
-                    common_words = words1.intersection(words2)
-                    similarity = len(common_words) / max(len(words1), len(words2))
-                    
-                    if similarity > 0.5:  # Umbral de similitud
-                        similarities.append({
-                            'student1': eval1['estudiante'],
-                            'student2': eval2['estudiante'],
-                            'similarity': similarity
-                        })
+        for i, j in self._candidate_pairs(word_sets):
+            size1 = sizes[i]
+            size2 = sizes[j]
+            
+            if size1 == 0 or size2 == 0:
+                continue
+            
+            # La similitud nunca supera min/max: descartar sin intersectar
+            if min(size1, size2) / max(size1, size2) <= min_similarity:
+                continue
+            
+            # Similitud básica por palabras comunes
+            common_words = word_sets[i] & word_sets[j]
+            similarity = len(common_words) / max(size1, size2)
+            
+            if similarity > min_similarity:
+                similarities.append({
+                    'student1': evaluations[i]['estudiante'],
+                    'student2': evaluations[j]['estudiante'],
+                    'similarity': similarity
+                })
         
         return similarities
     
+    def _candidate_pairs(self, word_sets: List[frozenset]):
+        """Pares (i, j) a comparar; con datasketch usa MinHash/LSH en vez de todos los pares."""
+        
+        if MinHashLSH is None or len(word_sets) < LSH_MIN_GROUP_SIZE:
+            return combinations(range(len(word_sets)), 2)
+        
+        # Si palabras comunes / max(|A|, |B|) >= t, el Jaccard es al menos t / (2 - t)
+        umbral = self.thresholds["plagio_similarity"]
+        lsh = MinHashLSH(threshold=umbral / (2 - umbral), num_perm=LSH_NUM_PERM)
+        
+        signatures = {}
+        for idx, words in enumerate(word_sets):
+            if not words:
+                continue
+            signature = MinHash(num_perm=LSH_NUM_PERM)
+            for word in words:
+                signature.update(word.encode('utf-8'))
+            signatures[idx] = signature
+            lsh.insert(idx, signature)
+        
+        pairs = set()
+        for idx, signature in signatures.items():
+            for other in lsh.query(signature):
+                if other != idx:
+                    pairs.add((min(idx, other), max(idx, other)))
+        
+        return sorted(pairs)
+    
     def _analyze_criteria_strengths(self, evaluation: Dict) -> tuple:
         """Analiza las fortalezas y debilidades de un estudiante."""
         
-        areas_fuertes = []
-        areas_debiles = []
+        criterios = evaluation.get('criterios', [])
+        scores = np.fromiter(
+            (c.get('puntuacion', 0) for c in criterios), dtype=np.float64, count=len(criterios)
+        )
+        fuertes, debiles = _classify_scores(scores)
         
-        for criterio in evaluation.get('criterios', []):
-            puntuacion = criterio.get('puntuacion', 0)
-            nombre = criterio.get('criterio', '')
-            
-            if puntuacion >= 80:
-                areas_fuertes.append(nombre)
-            elif puntuacion < 60:
-                areas_debiles.append(nombre)
+        nombres = [c.get('criterio', '') for c in criterios]
+        areas_fuertes = [nombre for nombre, es_fuerte in zip(nombres, fuertes) if es_fuerte]
+        areas_debiles = [nombre for nombre, es_debil in zip(nombres, debiles) if es_debil]
         
         return areas_fuertes, areas_debiles
     
     def generate_monitoring_report(self, alerts: List[Alert], progress_data: List[StudentProgress]) -> str:
         """Genera un reporte de monitoreo completo."""
         
-        report = f"""# 🚨 Reporte de Monitoreo Inteligente
+        now = datetime.now()
+        parts = [f"""# 🚨 Reporte de Monitoreo Inteligente
 
-**Fecha:** {datetime.now().strftime('%d/%m/%Y %H:%M')}  
+**Fecha:** {now.strftime('%d/%m/%Y %H:%M')}  
 **Total Alertas:** {len(alerts)}  
 **Estudiantes Monitoreados:** {len(progress_data)}
 
 ## 🔴 Alertas Críticas
 
-"""
+"""]
         
         # Filtrar alertas críticas
         critical_alerts = [a for a in alerts if a.severidad == "critica"]
         
         if critical_alerts:
             for alert in critical_alerts:
-                report += f"### 🚨 {alert.titulo}\n\n"
-                report += f"**Estudiante:** {alert.estudiante}\n"
-                report += f"**Tipo:** {alert.tipo}\n"
-                report += f"**Descripción:** {alert.descripcion}\n\n"
+                parts.append(
+                    f"### 🚨 {alert.titulo}\n\n"
+                    f"**Estudiante:** {alert.estudiante}\n"
+                    f"**Tipo:** {alert.tipo}\n"
+                    f"**Descripción:** {alert.descripcion}\n\n"
+                )
                 
                 if alert.evidencias:
-                    report += "**Evidencias:**\n"
-                    for evidencia in alert.evidencias:
-                        report += f"- {evidencia}\n"
-                    report += "\n"
+                    parts.append("**Evidencias:**\n")
+                    parts.extend(f"- {evidencia}\n" for evidencia in alert.evidencias)
+                    parts.append("\n")
                 
                 if alert.recomendaciones:
-                    report += "**Recomendaciones:**\n"
-                    for rec in alert.recomendaciones:
-                        report += f"- {rec}\n"
-                    report += "\n"
+                    parts.append("**Recomendaciones:**\n")
+                    parts.extend(f"- {rec}\n" for rec in alert.recomendaciones)
+                    parts.append("\n")
                 
-                report += "---\n\n"
+                parts.append("---\n\n")
         else:
-            report += "✅ No hay alertas críticas\n\n"
+            parts.append("✅ No hay alertas críticas\n\n")
         
         # Alertas por severidad
-        for severidad in ["alta", "media", "baja"]:
+        for severidad, emoji in _SEVERITY_SECTIONS:
             severity_alerts = [a for a in alerts if a.severidad == severidad]
             
             if severity_alerts:
-                emoji = {"alta": "🟠", "media": "🟡", "baja": "🟢"}[severidad]
-                report += f"## {emoji} Alertas {severidad.title()}\n\n"
+                parts.append(f"## {emoji} Alertas {severidad.title()}\n\n")
                 
                 for alert in severity_alerts[:5]:  # Máximo 5 por severidad
-                    report += f"### {alert.titulo}\n"
-                    report += f"**Estudiante:** {alert.estudiante}\n"
-                    report += f"**Tipo:** {alert.tipo}\n\n"
+                    parts.append(
+                        f"### {alert.titulo}\n"
+                        f"**Estudiante:** {alert.estudiante}\n"
+                        f"**Tipo:** {alert.tipo}\n\n"
+                    )
                 
-                report += "\n"
+                parts.append("\n")
         
         # Resumen de progreso
-        report += "## 📊 Resumen de Progreso\n\n"
+        parts.append("## 📊 Resumen de Progreso\n\n")
         
         if progress_data:
             # Estadísticas generales
             notas_promedio = [p.nota_promedio for p in progress_data]
-            report += f"**Nota promedio general:** {sum(notas_promedio)/len(notas_promedio):.2f}/7.0\n\n"
+            parts.append(f"**Nota promedio general:** {sum(notas_promedio)/len(notas_promedio):.2f}/7.0\n\n")
             
             # Tendencias
-            tendencias = {"mejorando": 0, "estable": 0, "empeorando": 0}
+            tendencias = dict.fromkeys(_TREND_EMOJI, 0)
             for progress in progress_data:
                 tendencias[progress.tendencia] += 1
             
-            report += "**Distribución de tendencias:**\n"
+            parts.append("**Distribución de tendencias:**\n")
             for tendencia, count in tendencias.items():
-                emoji = {"mejorando": "📈", "estable": "➡️", "empeorando": "📉"}[tendencia]
-                report += f"- {emoji} {tendencia.title()}: {count} estudiantes\n"
+                parts.append(f"- {_TREND_EMOJI[tendencia]} {tendencia.title()}: {count} estudiantes\n")
             
-            report += "\n"
+            parts.append("\n")
             
             # Top estudiantes
             top_students = sorted(progress_data, key=lambda x: x.nota_promedio, reverse=True)[:3]
-            report += "### 🏆 Top 3 Estudiantes\n\n"
+            parts.append("### 🏆 Top 3 Estudiantes\n\n")
             
             for i, student in enumerate(top_students, 1):
-                report += f"{i}. **{student.nombre}** - {student.nota_promedio:.2f}/7.0\n"
-                report += f"   - Tendencia: {student.tendencia}\n"
-                report += f"   - Fortalezas: {', '.join(student.areas_fuertes[:2])}\n\n"
+                parts.append(
+                    f"{i}. **{student.nombre}** - {student.nota_promedio:.2f}/7.0\n"
+                    f"   - Tendencia: {student.tendencia}\n"
+                    f"   - Fortalezas: {', '.join(student.areas_fuertes[:2])}\n\n"
+                )
         
-        report += f"\n---\n\n*Reporte generado automáticamente el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}*"
+        parts.append(f"\n---\n\n*Reporte generado automáticamente el {now.strftime('%d/%m/%Y a las %H:%M')}*")
         
-        return report
+        return "".join(parts)
 
 
 # Ejemplo de uso
@@ -6,21 +6,174 @@ Utiliza técnicas de planificación y meta-prompting para evaluaciones más rigu
 
 import os
 import sys
+import io
 import json
-from typing import List, Dict, Any, Optional
+import time
+import asyncio
+import importlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 from datetime import datetime
-import requests
-import openai
+import httpx
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 
 # Agregar src al path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from config import Config
+from agents.prompt_cache import PromptCache
 
-@dataclass
+# orjson es opcional: parsea y serializa varias veces más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pysimdjson es opcional: parser SIMD, el más rápido para documentos completos
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# msgspec es opcional: decodifica y valida el plan en C en un solo paso
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+_JSON_DECODER = json.JSONDecoder()
+
+# openai y requests se importan solo cuando el proveedor en uso los necesita
+_openai = None
+_requests = None
+
+def _load_openai():
+    """Importa openai la primera vez que se usa el proveedor github."""
+    global _openai
+    if _openai is None:
+        _openai = importlib.import_module("openai")
+    return _openai
+
+def _load_requests():
+    """Importa requests la primera vez que se usa el proveedor ollama."""
+    global _requests
+    if _requests is None:
+        _requests = importlib.import_module("requests")
+    return _requests
+
+# Pool HTTP para los clientes LLM: suficiente para los lotes concurrentes de
+# create_multi_criteria_plan sin abrir conexiones nuevas en cada llamada
+_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
+# Un parser simdjson por hilo: reutilizarlo evita reservar buffers en cada respuesta
+_SIMDJSON_LOCAL = threading.local()
+
+def _fast_loads(texto: str) -> Any:
+    """Decodifica un documento JSON completo con el parser más rápido disponible.
+    
+    Lanza ValueError o RuntimeError si el texto no es JSON válido.
+    """
+    if simdjson is not None:
+        parser = getattr(_SIMDJSON_LOCAL, 'parser', None)
+        if parser is None:
+            parser = _SIMDJSON_LOCAL.parser = simdjson.Parser()
+        doc = parser.parse(texto.encode('utf-8'))
+        if isinstance(doc, simdjson.Object):
+            return doc.as_dict()
+        raise ValueError("El documento JSON no es un objeto")
+    return orjson.loads(texto)
+
+class LLMServiceUnavailable(Exception):
+    """El servidor del LLM respondió con un error transitorio (429 o 5xx)."""
+
+def _is_retryable(error: BaseException) -> bool:
+    """Indica si es un error de red o del servidor que justifica reintentar la llamada."""
+    if isinstance(error, (httpx.HTTPError, LLMServiceUnavailable)):
+        return True
+    # Si el módulo no se importó, el error no puede venir de él
+    if _requests is not None and isinstance(error, _requests.RequestException):
+        return True
+    return _openai is not None and isinstance(
+        error, (_openai.APIConnectionError, _openai.RateLimitError, _openai.InternalServerError)
+    )
+
+# Tres intentos con espera exponencial (2s, 4s... máx. 10s); luego se propaga el error
+_llm_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=2, max=10),
+    retry=retry_if_exception(_is_retryable),
+    reraise=True
+)
+
+def _raise_for_ollama_status(status_code: int):
+    """Convierte una respuesta no exitosa de Ollama en excepción (reintentable si es transitoria)."""
+    if status_code == 429 or status_code >= 500:
+        raise LLMServiceUnavailable(f"Error de Ollama: {status_code}")
+    raise Exception(f"Error de Ollama: {status_code}")
+
+class _JsonStreamScanner:
+    """Acumula texto recibido por partes y detecta el cierre del primer objeto JSON."""
+    
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+    
+    def feed(self, chunk: str) -> bool:
+        """Agrega un fragmento; devuelve True cuando el objeto JSON quedó cerrado."""
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                # Las comillas antes de la primera llave no abren un string JSON
+                self.in_string = self.depth > 0
+            elif ch == '{':
+                if self.depth == 0:
+                    self.start = self.size + i
+                self.depth += 1
+            elif ch == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0 and self._is_json_object(chunk[:i + 1]):
+                    self.parts.append(chunk[:i + 1])
+                    self.complete = True
+                    return True
+        
+        self.parts.append(chunk)
+        self.size += len(chunk)
+        return False
+    
+    def _is_json_object(self, tail: str) -> bool:
+        """Comprueba que lo cerrado sea un objeto JSON y no texto como "Plan para {criterio}"."""
+        candidate = ("".join(self.parts) + tail)[self.start:]
+        try:
+            return isinstance(_fast_loads(candidate), dict)
+        except (ValueError, RuntimeError):
+            return False
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+@dataclass(frozen=True)
 class EvaluationPlan:
     """Plan de evaluación estructurado."""
+    # __slots__ explícito (compatible con Python 3.8): sin __dict__ por instancia
+    __slots__ = ('criterio', 'objetivos', 'estrategias', 'criterios_especificos',
+                 'evidencias_requeridas', 'pasos_evaluacion', 'criterios_puntuacion', 'tiempo_estimado')
+    
     criterio: str
     objetivos: List[str]
     estrategias: List[str]
@@ -29,137 +182,220 @@ class EvaluationPlan:
     pasos_evaluacion: List[str]
     criterios_puntuacion: Dict[str, str]
     tiempo_estimado: int  # minutos
+    
+    def __getstate__(self):
+        """Estado para copy/pickle: los valores en el orden de __slots__."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        """Restaura el estado sin pasar por el __setattr__ congelado."""
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
-@dataclass
+@dataclass(frozen=True)
 class PlanningContext:
     """Contexto para la planificación."""
+    __slots__ = ('tipo_proyecto', 'tecnologias', 'complejidad', 'nivel_estudiante', 'objetivos_curso')
+    
     tipo_proyecto: str
     tecnologias: List[str]
     complejidad: str
     nivel_estudiante: str
     objetivos_curso: List[str]
-
-class PlanningAgent:
-    """Agente especializado en planificación de evaluaciones."""
-    
-    def __init__(self):
-        """Inicializa el agente de planificación."""
-        self.provider = Config.LLM_PROVIDER
-        
-        if self.provider == "github":
-            self.client = openai.OpenAI(
-                base_url=Config.LLM_PROVIDERS["github"]["base_url"],
-                api_key=Config.GITHUB_TOKEN
-            )
-            self.model = "gpt-4o-mini"
-        elif self.provider == "ollama":
-            self.ollama_url = Config.LLM_PROVIDERS["ollama"]["base_url"]
-            self.model = "llama3:latest"
     
-    def create_evaluation_plan(self, criterio: str, contexto: PlanningContext, evidencias: Dict[str, Any]) -> EvaluationPlan:
-        """Crea un plan de evaluación detallado usando meta-prompting."""
-        
-        planning_prompt = self._build_planning_prompt(criterio, contexto, evidencias)
-        plan_response = self._call_llm(planning_prompt)
-        
-        return self._parse_evaluation_plan(plan_response, criterio)
+    def __getstate__(self):
+        """Estado para copy/pickle: los valores en el orden de __slots__."""
+        return tuple(getattr(self, name) for name in self.__slots__)
     
-    def _build_planning_prompt(self, criterio: str, contexto: PlanningContext, evidencias: Dict[str, Any]) -> str:
-        """Construye el prompt de planificación usando meta-prompting."""
-        
-        return f"""
-META-PROMPTING: PLANIFICACIÓN ESTRATÉGICA DE EVALUACIÓN
+    def __setstate__(self, state):
+        """Restaura el estado sin pasar por el __setattr__ congelado."""
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
-Eres un experto en diseño de evaluaciones educativas que debe crear un plan estratégico detallado.
+if msgspec is not None:
+    class _PlanDTO(msgspec.Struct):
+        """Esquema del plan que devuelve el LLM; los campos extra se ignoran."""
+        objetivos: List[str] = []
+        estrategias: List[str] = []
+        criterios_especificos: Dict[str, str] = {}
+        evidencias_requeridas: List[str] = []
+        pasos_evaluacion: List[str] = []
+        criterios_puntuacion: Dict[str, str] = {}
+        tiempo_estimado: int = 10
 
-CRITERIO A EVALUAR: {criterio}
+def _dumps(data: Any) -> str:
+    """Serializa a JSON sin escapar caracteres no ASCII."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False)
 
-CONTEXTO DEL PROYECTO:
-- Tipo de proyecto: {contexto.tipo_proyecto}
-- Tecnologías utilizadas: {', '.join(contexto.tecnologias)}
-- Complejidad: {contexto.complejidad}
-- Nivel del estudiante: {contexto.nivel_estudiante}
-- Objetivos del curso: {', '.join(contexto.objetivos_curso)}
+# Respaldo cuando el LLM falla: idéntico en cada llamada, se serializa una sola vez
+_FALLBACK_JSON = _dumps({
+    "objetivos": ["Evaluar cumplimiento del criterio"],
+    "estrategias": ["Análisis de evidencias disponibles"],
+    "criterios_especificos": {"cumplimiento": "Verificar cumplimiento básico"},
+    "evidencias_requeridas": ["Evidencias disponibles"],
+    "pasos_evaluacion": ["Análisis", "Evaluación", "Puntuación"],
+    "criterios_puntuacion": {
+        "0-25%": "Cumplimiento básico",
+        "26-50%": "Cumplimiento elemental",
+        "51-75%": "Cumplimiento intermedio",
+        "76-100%": "Cumplimiento avanzado"
+    },
+    "tiempo_estimado": 10
+})
 
-EVIDENCIAS DISPONIBLES:
-{self._format_evidence_for_planning(evidencias)}
-
-INSTRUCCIONES DE PLANIFICACIÓN:
-1. Analiza el criterio en el contexto específico del proyecto
-2. Define objetivos de evaluación claros y medibles
-3. Diseña estrategias de evaluación apropiadas para el nivel
-4. Establece criterios específicos de puntuación
-5. Identifica evidencias clave que deben ser evaluadas
-6. Crea pasos de evaluación estructurados
-7. Estima el tiempo necesario para una evaluación rigurosa
+# Diccionarios del plan de respaldo; cada plan recibe su propia copia
+_FALLBACK_SPECIFIC = {"cumplimiento": "Verificar cumplimiento"}
+_FALLBACK_SCORING = {
+    "0-25%": "Básico",
+    "26-50%": "Elemental",
+    "51-75%": "Intermedio",
+    "76-100%": "Avanzado"
+}
 
-FORMATO DE RESPUESTA:
-{{
+class PlanningAgent:
+    """Agente especializado en planificación de evaluaciones.
+    
+    create_multi_criteria_plan pide los planes en lotes de BATCH_PLANNING_SIZE
+    criterios por llamada y lanza los lotes de forma concurrente. Con Ollama, el servidor atiende en paralelo hasta
+    OLLAMA_NUM_PARALLEL solicitudes (variable de entorno de `ollama serve`);
+    el resto espera en su cola.
+    """
+    
+    SYSTEM_PROMPT = "Eres un experto en planificación educativa. SIEMPRE responde en ESPAÑOL con JSON válido."
+    
+    # Instrucciones fijas de cada tarea: se envían antes que los datos variables
+    # para que el prefijo del prompt sea idéntico entre llamadas (prefix caching)
+    PLAN_SCHEMA = """{
     "objetivos": ["objetivo1", "objetivo2", "objetivo3"],
     "estrategias": ["estrategia1", "estrategia2", "estrategia3"],
-    "criterios_especificos": {{
+    "criterios_especificos": {
         "aspecto1": "Criterio específico para aspecto1",
         "aspecto2": "Criterio específico para aspecto2"
-    }},
+    },
     "evidencias_requeridas": ["evidencia1", "evidencia2", "evidencia3"],
     "pasos_evaluacion": [
         "Paso 1: Análisis inicial",
         "Paso 2: Evaluación de evidencias",
         "Paso 3: Determinación de puntuación"
     ],
-    "criterios_puntuacion": {{
+    "criterios_puntuacion": {
         "0-25%": "Descripción de nivel básico",
         "26-50%": "Descripción de nivel elemental",
         "51-75%": "Descripción de nivel intermedio",
         "76-100%": "Descripción de nivel avanzado"
-    }},
+    },
     "tiempo_estimado": 15
+}"""
+    
+    PLANNING_STEPS = """INSTRUCCIONES DE PLANIFICACIÓN:
+1. Analiza el criterio en el contexto específico del proyecto
+2. Define objetivos de evaluación claros y medibles
+3. Diseña estrategias de evaluación apropiadas para el nivel
+4. Establece criterios específicos de puntuación
+5. Identifica evidencias clave que deben ser evaluadas
+6. Crea pasos de evaluación estructurados
+7. Estima el tiempo necesario para una evaluación rigurosa"""
+    
+    PLANNING_INSTRUCTIONS = f"""META-PROMPTING: PLANIFICACIÓN ESTRATÉGICA DE EVALUACIÓN
+
+Eres un experto en diseño de evaluaciones educativas que debe crear un plan estratégico detallado
+para el criterio, contexto y evidencias que se indican a continuación.
+
+{PLANNING_STEPS}
+
+FORMATO DE RESPUESTA:
+{PLAN_SCHEMA}
+
+Responde ÚNICAMENTE con JSON válido en ESPAÑOL."""
+    
+    BATCH_PLANNING_INSTRUCTIONS = f"""META-PROMPTING: PLANIFICACIÓN ESTRATÉGICA DE EVALUACIÓN
+
+Eres un experto en diseño de evaluaciones educativas que debe crear un plan estratégico detallado
+para CADA UNO de los criterios que se indican a continuación, en el contexto y con las evidencias dadas.
+
+{PLANNING_STEPS}
+
+FORMATO DE RESPUESTA (un plan por criterio, usando el nombre exacto del criterio como clave):
+{{
+    "planes": {{
+        "<criterio>": {PLAN_SCHEMA}
+    }}
 }}
 
-Responde ÚNICAMENTE con JSON válido en ESPAÑOL.
+Responde ÚNICAMENTE con JSON válido en ESPAÑOL."""
+    
+    # Criterios por llamada en modo lote
+    BATCH_PLANNING_SIZE = 4
+    
+    # Hilos para pedir lotes cuando ya hay un event loop activo
+    MAX_PLANNING_WORKERS = 8
+    
+    # Presupuesto de tokens de salida: un plan JSON ronda los 600 tokens
+    PLAN_MAX_TOKENS = 700
+    PLAN_TOKENS_PER_ITEM = 600
+    BATCH_BASE_TOKENS = 200
+    OPTIMIZATION_MAX_TOKENS = 800
+    DEFAULT_MAX_TOKENS = 2000
+    
+    # Máximo de resúmenes de planes memorizados antes de vaciar la caché
+    PLAN_FRAGMENT_CACHE_SIZE = 256
+    
+    # Máximo de respuestas memorizadas en el proceso
+    RESPONSE_MEMO_SIZE = 256
+    
+    # Vigencia (segundos) de una respuesta cacheada, en memoria y en disco
+    PLAN_CACHE_TTL = 1800
+    
+    # Plantillas de la parte variable: solo se sustituyen campos en cada llamada
+    PLANNING_TEMPLATE = """CRITERIO A EVALUAR: {criterio}
+
+CONTEXTO DEL PROYECTO:
+- Tipo de proyecto: {tipo_proyecto}
+- Tecnologías utilizadas: {tecnologias}
+- Complejidad: {complejidad}
+- Nivel del estudiante: {nivel_estudiante}
+- Objetivos del curso: {objetivos_curso}
+
+EVIDENCIAS DISPONIBLES:
+{evidencias}
 """
     
-    def create_multi_criteria_plan(self, criterios: List[str], contexto: PlanningContext) -> Dict[str, EvaluationPlan]:
-        """Crea planes de evaluación para múltiples criterios."""
-        
-        plans = {}
-        for criterio in criterios:
-            # Crear contexto específico para cada criterio
-            criterio_contexto = self._adapt_context_for_criterion(criterio, contexto)
-            
-            # Crear plan individual
-            plan = self.create_evaluation_plan(criterio, criterio_contexto, {})
-            plans[criterio] = plan
-        
-        return plans
+    BATCH_PLANNING_TEMPLATE = """CRITERIOS A EVALUAR:
+{criterios}
+
+CONTEXTO DEL PROYECTO:
+- Tipo de proyecto: {tipo_proyecto}
+- Tecnologías utilizadas: {tecnologias}
+- Complejidad: {complejidad}
+- Nivel del estudiante: {nivel_estudiante}
+- Objetivos del curso: {objetivos_curso}
+
+EVIDENCIAS DISPONIBLES:
+{evidencias}
+"""
     
-    def optimize_evaluation_sequence(self, plans: Dict[str, EvaluationPlan]) -> List[str]:
-        """Optimiza la secuencia de evaluación para máxima eficiencia."""
-        
-        optimization_prompt = self._build_optimization_prompt(plans)
-        sequence_response = self._call_llm(optimization_prompt)
-        
-        return self._parse_optimization_result(sequence_response)
+    # Evidencias con esquema fijo: mismas líneas y orden en cada llamada
+    EVIDENCE_TEMPLATE = """Directorios disponibles: {directories}
+Archivos disponibles: {files}
+README presente: {readme}
+Requirements presente: {requirements}"""
     
-    def _build_optimization_prompt(self, plans: Dict[str, EvaluationPlan]) -> str:
-        """Construye el prompt de optimización de secuencia."""
-        
-        plans_info = []
-        for criterio, plan in plans.items():
-            plans_info.append(f"""
+    # Tope de los conteos de evidencias mostrados en el prompt
+    EVIDENCE_COUNT_LIMIT = 9999
+    
+    PLAN_SUMMARY_TEMPLATE = """
 Criterio: {criterio}
-Tiempo estimado: {plan.tiempo_estimado} minutos
-Evidencias requeridas: {', '.join(plan.evidencias_requeridas)}
-Complejidad: {'Alta' if len(plan.pasos_evaluacion) > 5 else 'Media' if len(plan.pasos_evaluacion) > 3 else 'Baja'}
-""")
-        
-        return f"""
-OPTIMIZACIÓN DE SECUENCIA DE EVALUACIÓN
-
-Eres un experto en optimización de procesos que debe determinar el orden óptimo de evaluación.
+Tiempo estimado: {tiempo_estimado} minutos
+Evidencias requeridas: {evidencias}
+Complejidad: {complejidad}
+"""
+    
+    OPTIMIZATION_INSTRUCTIONS = """OPTIMIZACIÓN DE SECUENCIA DE EVALUACIÓN
 
-PLANES DE EVALUACIÓN DISPONIBLES:
-{''.join(plans_info)}
+Eres un experto en optimización de procesos que debe determinar el orden óptimo de evaluación
+de los planes que se indican a continuación.
 
 CRITERIOS DE OPTIMIZACIÓN:
 1. Minimizar el tiempo total de evaluación
@@ -175,64 +411,479 @@ INSTRUCCIONES:
 4. Justifica tu decisión
 
 FORMATO DE RESPUESTA:
-{{
+{
     "secuencia_optimizada": ["criterio1", "criterio2", "criterio3"],
     "criterios_paralelos": [["criterioA", "criterioB"], ["criterioC", "criterioD"]],
     "tiempo_total_estimado": 120,
     "justificacion": "Explicación detallada del orden elegido",
     "consideraciones_especiales": ["consideración1", "consideración2"]
-}}
+}
 
-Responde ÚNICAMENTE con JSON válido en ESPAÑOL.
-"""
+Responde ÚNICAMENTE con JSON válido en ESPAÑOL."""
     
-    def _call_llm(self, prompt: str) -> str:
-        """Realiza la llamada al LLM."""
+    def __init__(self):
+        """Inicializa el agente de planificación."""
+        self.provider = Config.LLM_PROVIDER
+        
+        if self.provider == "github":
+            self.client = _load_openai().OpenAI(
+                base_url=Config.LLM_PROVIDERS["github"]["base_url"],
+                api_key=Config.GITHUB_TOKEN,
+                http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+            )
+            self.model = "gpt-4o-mini"
+        elif self.provider == "ollama":
+            self.ollama_url = Config.LLM_PROVIDERS["ollama"]["base_url"]
+            self.model = "llama3:latest"
+            
+            # Sesión persistente: reutiliza conexiones keep-alive entre llamadas
+            requests = _load_requests()
+            self.session = requests.Session()
+            self.session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0))
+        
+        # Caché persistente de respuestas (se desactiva con USE_CACHE=false)
+        self.cache = PromptCache()
+        
+        # Respuestas ya obtenidas en este proceso (LRU delante de la caché en disco)
+        self._response_memo: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        
+        # Resúmenes de planes ya formateados para el prompt de optimización
+        self._plan_fragments: Dict[tuple, tuple] = {}
+    
+    def create_evaluation_plan(self, criterio: str, contexto: PlanningContext, evidencias: Dict[str, Any]) -> EvaluationPlan:
+        """Crea un plan de evaluación detallado usando meta-prompting."""
+        
+        planning_prompt = self._build_planning_prompt(criterio, contexto, evidencias)
+        plan_response = self._call_llm(
+            planning_prompt, self.PLANNING_INSTRUCTIONS, self._estimate_max_tokens("plan")
+        )
+        
+        return self._parse_evaluation_plan(plan_response, criterio)
+    
+    async def acreate_evaluation_plan(self, criterio: str, contexto: PlanningContext, evidencias: Dict[str, Any], client) -> EvaluationPlan:
+        """Versión asíncrona de create_evaluation_plan sobre un cliente compartido."""
+        
+        planning_prompt = self._build_planning_prompt(criterio, contexto, evidencias)
+        plan_response = await self._acall_llm(
+            planning_prompt, client, self.PLANNING_INSTRUCTIONS, self._estimate_max_tokens("plan")
+        )
+        
+        return self._parse_evaluation_plan(plan_response, criterio)
+    
+    def _build_planning_prompt(self, criterio: str, contexto: PlanningContext, evidencias: Dict[str, Any]) -> str:
+        """Construye la parte variable del prompt de planificación.
+        
+        Las instrucciones fijas viven en PLANNING_INSTRUCTIONS y van primero, de
+        modo que el proveedor pueda reutilizar ese prefijo entre llamadas.
+        """
+        
+        return self.PLANNING_TEMPLATE.format_map({
+            'criterio': criterio,
+            'tipo_proyecto': contexto.tipo_proyecto,
+            'tecnologias': ', '.join(contexto.tecnologias),
+            'complejidad': contexto.complejidad,
+            'nivel_estudiante': contexto.nivel_estudiante,
+            'objetivos_curso': ', '.join(contexto.objetivos_curso),
+            'evidencias': self._format_evidence_for_planning(evidencias)
+        })
+    
+    def create_multi_criteria_plan(self, criterios: List[str], contexto: PlanningContext) -> Dict[str, EvaluationPlan]:
+        """Crea planes de evaluación para múltiples criterios.
+        
+        Los criterios se agrupan en lotes (una llamada al LLM por lote) y los
+        lotes se piden en paralelo; si ya hay un event loop activo (p. ej. en
+        Jupyter) los lotes se reparten en un pool de hilos. Los criterios que
+        falten en la respuesta de un lote se planifican individualmente.
+        """
+        
+        if not criterios:
+            return {}
+        
+        lotes = self._batch_criteria(criterios)
+        
         try:
-            if self.provider == "github":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "Eres un experto en planificación educativa. SIEMPRE responde en ESPAÑOL con JSON válido."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=2000
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._acreate_plans(lotes, contexto))
+        
+        # La E/S de red libera el GIL, así que los hilos sí se solapan
+        plans = {}
+        with ThreadPoolExecutor(max_workers=min(self.MAX_PLANNING_WORKERS, len(lotes))) as executor:
+            for batch_plans in executor.map(lambda lote: self._create_batch_plans(lote, contexto), lotes):
+                plans.update(batch_plans)
+        
+        return plans
+    
+    def _batch_criteria(self, criterios: List[str]) -> List[List[str]]:
+        """Divide los criterios (sin repetir) en lotes de BATCH_PLANNING_SIZE."""
+        unicos = list(dict.fromkeys(criterios))
+        size = self.BATCH_PLANNING_SIZE
+        return [unicos[i:i + size] for i in range(0, len(unicos), size)]
+    
+    def _create_batch_plans(self, lote: List[str], contexto: PlanningContext) -> Dict[str, EvaluationPlan]:
+        """Crea los planes de un lote con una sola llamada al LLM."""
+        
+        if len(lote) == 1:
+            criterio = lote[0]
+            return {criterio: self.create_evaluation_plan(
+                criterio, self._adapt_context_for_criterion(criterio, contexto), {}
+            )}
+        
+        response = self._call_llm(
+            self._build_batch_planning_prompt(lote, contexto), self.BATCH_PLANNING_INSTRUCTIONS,
+            self._estimate_max_tokens("batch", len(lote)),
+            validate=lambda r: bool(self._parse_batch_plans(r, lote))
+        )
+        plans = self._parse_batch_plans(response, lote)
+        
+        for criterio in lote:
+            if criterio not in plans:
+                plans[criterio] = self.create_evaluation_plan(
+                    criterio, self._adapt_context_for_criterion(criterio, contexto), {}
                 )
-                return response.choices[0].message.content
-                
-            elif self.provider == "ollama":
-                payload = {
-                    "model": self.model,
-                    "prompt": f"Eres un experto en planificación educativa. SIEMPRE responde en ESPAÑOL con JSON válido.\n\n{prompt}",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "num_predict": 2000,
-                        "top_p": 0.9
-                    }
-                }
-                
-                response = requests.post(
-                    f"{self.ollama_url}/api/generate",
-                    json=payload,
-                    timeout=120
+        
+        return {criterio: plans[criterio] for criterio in lote}
+    
+    async def _acreate_plans(self, lotes: List[List[str]], contexto: PlanningContext) -> Dict[str, EvaluationPlan]:
+        """Crea los planes de todos los lotes concurrentemente."""
+        
+        async with self._create_async_client() as client:
+            results = await asyncio.gather(*[
+                self._acreate_batch_plans(lote, contexto, client) for lote in lotes
+            ])
+        
+        plans = {}
+        for lote_plans in results:
+            plans.update(lote_plans)
+        return plans
+    
+    async def _acreate_batch_plans(self, lote: List[str], contexto: PlanningContext, client) -> Dict[str, EvaluationPlan]:
+        """Versión asíncrona de _create_batch_plans."""
+        
+        plans = {}
+        if len(lote) > 1:
+            response = await self._acall_llm(
+                self._build_batch_planning_prompt(lote, contexto), client, self.BATCH_PLANNING_INSTRUCTIONS,
+                self._estimate_max_tokens("batch", len(lote)),
+                validate=lambda r: bool(self._parse_batch_plans(r, lote))
+            )
+            plans = self._parse_batch_plans(response, lote)
+        
+        faltantes = [criterio for criterio in lote if criterio not in plans]
+        if faltantes:
+            individuales = await asyncio.gather(*[
+                self.acreate_evaluation_plan(
+                    criterio, self._adapt_context_for_criterion(criterio, contexto), {}, client
                 )
+                for criterio in faltantes
+            ])
+            plans.update(zip(faltantes, individuales))
+        
+        return {criterio: plans[criterio] for criterio in lote}
+    
+    def _build_batch_planning_prompt(self, criterios: List[str], contexto: PlanningContext) -> str:
+        """Construye la parte variable del prompt de planificación en lote."""
+        
+        return self.BATCH_PLANNING_TEMPLATE.format_map({
+            'criterios': "\n".join(f"- {criterio}" for criterio in criterios),
+            'tipo_proyecto': contexto.tipo_proyecto,
+            'tecnologias': ', '.join(contexto.tecnologias),
+            'complejidad': contexto.complejidad,
+            'nivel_estudiante': contexto.nivel_estudiante,
+            'objetivos_curso': ', '.join(contexto.objetivos_curso),
+            'evidencias': self._format_evidence_for_planning({})
+        })
+    
+    def optimize_evaluation_sequence(self, plans: Dict[str, EvaluationPlan]) -> List[str]:
+        """Optimiza la secuencia de evaluación para máxima eficiencia."""
+        
+        optimization_prompt = self._build_optimization_prompt(plans)
+        sequence_response = self._call_llm(
+            optimization_prompt, self.OPTIMIZATION_INSTRUCTIONS, self._estimate_max_tokens("optimization")
+        )
+        
+        return self._parse_optimization_result(sequence_response)
+    
+    def _build_optimization_prompt(self, plans: Dict[str, EvaluationPlan]) -> str:
+        """Construye la parte variable del prompt de optimización de secuencia."""
+        
+        buf = io.StringIO()
+        buf.write("PLANES DE EVALUACIÓN DISPONIBLES:\n")
+        for criterio, plan in plans.items():
+            buf.write(self._plan_fragment(criterio, plan))
+        
+        return buf.getvalue()
+    
+    def _plan_fragment(self, criterio: str, plan: EvaluationPlan) -> str:
+        """Resumen de un plan para el prompt de optimización, memorizado por instancia.
+        
+        Los planes son inmutables, así que el mismo objeto siempre produce el mismo
+        texto; se guarda la referencia al plan para que su id no se reutilice.
+        """
+        key = (criterio, id(plan))
+        cached = self._plan_fragments.get(key)
+        if cached is not None and cached[0] is plan:
+            return cached[1]
+        
+        pasos = len(plan.pasos_evaluacion)
+        fragment = self.PLAN_SUMMARY_TEMPLATE.format_map({
+            'criterio': criterio,
+            'tiempo_estimado': plan.tiempo_estimado,
+            'evidencias': ', '.join(plan.evidencias_requeridas),
+            'complejidad': 'Alta' if pasos > 5 else 'Media' if pasos > 3 else 'Baja'
+        })
+        
+        if len(self._plan_fragments) >= self.PLAN_FRAGMENT_CACHE_SIZE:
+            self._plan_fragments.clear()
+        self._plan_fragments[key] = (plan, fragment)
+        return fragment
+    
+    def _system_prompt(self, instructions: str) -> str:
+        """Prefijo estático: rol del agente seguido de las instrucciones de la tarea."""
+        return f"{self.SYSTEM_PROMPT}\n\n{instructions}" if instructions else self.SYSTEM_PROMPT
+    
+    def _chat_messages(self, prompt: str, instructions: str = "") -> List[Dict[str, str]]:
+        """Mensajes para la API de chat (GitHub Models)."""
+        return [
+            {"role": "system", "content": self._system_prompt(instructions)},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _estimate_max_tokens(self, prompt_kind: str, n_items: int = 1) -> int:
+        """Límite de tokens de salida según el tipo de respuesta esperada."""
+        if prompt_kind == "plan":
+            return self.PLAN_MAX_TOKENS
+        if prompt_kind == "batch":
+            return self.BATCH_BASE_TOKENS + self.PLAN_TOKENS_PER_ITEM * n_items
+        if prompt_kind == "optimization":
+            return self.OPTIMIZATION_MAX_TOKENS
+        return self.DEFAULT_MAX_TOKENS
+    
+    def _ollama_payload(self, prompt: str, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS) -> Dict[str, Any]:
+        """Payload para /api/generate de Ollama."""
+        return {
+            "model": self.model,
+            "prompt": f"{self._system_prompt(instructions)}\n\n{prompt}",
+            "stream": True,
+            "options": {
+                "temperature": 0.1,
+                "num_predict": max_tokens,
+                "top_p": 0.9
+            }
+        }
+    
+    def _create_async_client(self):
+        """Cliente asíncrono según el proveedor (usable con async with)."""
+        if self.provider == "github":
+            return _load_openai().AsyncOpenAI(
+                base_url=Config.LLM_PROVIDERS["github"]["base_url"],
+                api_key=Config.GITHUB_TOKEN,
+                http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+            )
+        return httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+    
+    def _cache_key(self, prompt: str, instructions: str = "") -> str:
+        """Clave de caché: proveedor, modelo e instrucciones completas."""
+        return PromptCache.make_key(
+            self.provider, getattr(self, 'model', None), self._system_prompt(instructions), prompt
+        )
+    
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Busca la respuesta vigente en memoria y luego en la caché persistente."""
+        with self._memo_lock:
+            cached = self._response_memo.get(cache_key)
+            if cached is not None:
+                expira, response = cached
+                if expira > time.time():
+                    self._response_memo.move_to_end(cache_key)
+                    return response
+                del self._response_memo[cache_key]
+        
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self._memoize(cache_key, cached)
+        return cached
+    
+    def _memoize(self, cache_key: str, response: str):
+        """Guarda la respuesta en memoria descartando la menos usada si hace falta."""
+        with self._memo_lock:
+            self._response_memo[cache_key] = (time.time() + self.PLAN_CACHE_TTL, response)
+            if len(self._response_memo) > self.RESPONSE_MEMO_SIZE:
+                self._response_memo.popitem(last=False)
+    
+    def _store_response(self, cache_key: str, response: Optional[str],
+                        validate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Guarda la respuesta en caché solo si es válida y no es el plan de respaldo.
+        
+        Por defecto es válida si contiene un objeto JSON no vacío; así las
+        respuestas truncadas por max_tokens o mal formadas no se reutilizan.
+        El respaldo es siempre el mismo objeto _FALLBACK_JSON, así que basta
+        comparar identidad en vez del texto completo.
+        """
+        if not isinstance(response, str) or response is _FALLBACK_JSON:
+            return response
+        
+        if (validate or self._has_json)(response):
+            self._memoize(cache_key, response)
+            self.cache.set(cache_key, response, ttl=self.PLAN_CACHE_TTL)
+        return response
+    
+    def _has_json(self, response: str) -> bool:
+        """Indica si la respuesta contiene un objeto JSON no vacío."""
+        return bool(self._extract_json(response))
+    
+    async def _acall_llm(self, prompt: str, client, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS,
+                         validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Versión asíncrona de _call_llm."""
+        cache_key = self._cache_key(prompt, instructions)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await self._arequest_llm(prompt, client, instructions, max_tokens)
+        return self._store_response(cache_key, response, validate)
+    
+    async def _arequest_llm(self, prompt: str, client, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """Llamada asíncrona al LLM, sin caché (ver _request_llm)."""
+        try:
+            return await self._astream_llm(prompt, client, instructions, max_tokens)
+        except Exception as e:
+            print(f"Error en llamada LLM del Planning Agent: {e}")
+            return self._generate_fallback_plan()
+    
+    @_llm_retry
+    async def _astream_llm(self, prompt: str, client, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """Versión asíncrona de _stream_llm."""
+        scanner = _JsonStreamScanner()
+        
+        if self.provider == "github":
+            stream = await client.chat.completions.create(
+                model=self.model,
+                messages=self._chat_messages(prompt, instructions),
+                temperature=0.1,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if scanner.feed(chunk.choices[0].delta.content):
+                        break
+            await stream.close()
+            return scanner.text
+            
+        elif self.provider == "ollama":
+            async with client.stream(
+                "POST",
+                f"{self.ollama_url}/api/generate",
+                json=self._ollama_payload(prompt, instructions, max_tokens),
+                timeout=120
+            ) as response:
+                if response.status_code != 200:
+                    _raise_for_ollama_status(response.status_code)
                 
-                if response.status_code == 200:
-                    return response.json()["response"]
-                else:
-                    raise Exception(f"Error de Ollama: {response.status_code}")
-                    
+                async for line in response.aiter_lines():
+                    if line and scanner.feed(json.loads(line).get("response", "")):
+                        break
+            return scanner.text
+    
+    def _call_llm(self, prompt: str, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS,
+                  validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Realiza la llamada al LLM, reutilizando respuestas ya obtenidas.
+        
+        instructions es la parte fija de la tarea; se envía como prefijo (mensaje
+        de sistema) y prompt solo lleva los datos variables. validate decide si
+        la respuesta se cachea (ver _store_response).
+        """
+        cache_key = self._cache_key(prompt, instructions)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        return self._store_response(cache_key, self._request_llm(prompt, instructions, max_tokens), validate)
+    
+    def _request_llm(self, prompt: str, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """Llamada al LLM, sin caché; tras agotar los reintentos devuelve el plan de respaldo."""
+        try:
+            return self._stream_llm(prompt, instructions, max_tokens)
         except Exception as e:
             print(f"Error en llamada LLM del Planning Agent: {e}")
             return self._generate_fallback_plan()
     
+    @_llm_retry
+    def _stream_llm(self, prompt: str, instructions: str = "", max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """Recibe la respuesta del LLM en streaming.
+        
+        La conexión se cierra en cuanto el objeto JSON queda completo, sin
+        esperar el resto de la generación. Los errores transitorios de red o
+        del servidor se reintentan (ver _llm_retry).
+        """
+        scanner = _JsonStreamScanner()
+        
+        if self.provider == "github":
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._chat_messages(prompt, instructions),
+                temperature=0.1,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if scanner.feed(chunk.choices[0].delta.content):
+                        break
+            stream.close()
+            return scanner.text
+            
+        elif self.provider == "ollama":
+            with self.session.post(
+                f"{self.ollama_url}/api/generate",
+                json=self._ollama_payload(prompt, instructions, max_tokens),
+                timeout=120,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    _raise_for_ollama_status(response.status_code)
+                
+                for line in response.iter_lines():
+                    if line and scanner.feed(json.loads(line).get("response", "")):
+                        break
+            return scanner.text
+    
     def _parse_evaluation_plan(self, response: str, criterio: str) -> EvaluationPlan:
-        """Parsea la respuesta del LLM en un plan de evaluación."""
+        """Parsea la respuesta del LLM en un plan de evaluación.
+        
+        Si msgspec está disponible y la respuesta es solo el objeto JSON, se
+        decodifica y valida directamente contra _PlanDTO; si no cumple el
+        esquema se usa el parseo tolerante de siempre.
+        """
+        # Proveedores sin streaming (p. ej. gemini) no devuelven texto
+        if msgspec is not None and isinstance(response, str):
+            texto = response.strip()
+            if texto.startswith('{') and texto.endswith('}'):
+                try:
+                    dto = msgspec.json.decode(texto, type=_PlanDTO)
+                    return EvaluationPlan(criterio=criterio, **msgspec.structs.asdict(dto))
+                except msgspec.MsgspecError:
+                    pass
+        
+        return self._plan_from_data(self._extract_json(response), criterio)
+    
+    def _parse_batch_plans(self, response: str, criterios: List[str]) -> Dict[str, EvaluationPlan]:
+        """Parsea una respuesta en lote; omite los criterios sin plan válido."""
+        planes = self._extract_json(response).get('planes')
+        if not isinstance(planes, dict):
+            return {}
+        
+        return {
+            criterio: self._plan_from_data(planes[criterio], criterio)
+            for criterio in criterios
+            if isinstance(planes.get(criterio), dict)
+        }
+    
+    def _plan_from_data(self, data: Dict, criterio: str) -> EvaluationPlan:
+        """Construye un plan de evaluación a partir del JSON ya decodificado."""
         try:
-            data = self._extract_json(response)
-            
             return EvaluationPlan(
                 criterio=criterio,
                 objetivos=data.get('objetivos', []),
@@ -257,12 +908,30 @@ Responde ÚNICAMENTE con JSON válido en ESPAÑOL.
             return []
     
     def _extract_json(self, text: str) -> Dict:
-        """Extrae JSON de una respuesta de texto."""
+        """Extrae el primer objeto JSON de una respuesta de texto."""
         try:
             start = text.find('{')
-            end = text.rfind('}') + 1
-            json_str = text[start:end]
-            return json.loads(json_str)
+            if start < 0:
+                return {}
+            
+            # Caso habitual: la respuesta es solo el objeto JSON
+            if (simdjson is not None or orjson is not None) and text.rstrip().endswith('}'):
+                try:
+                    return _fast_loads(text[start:].rstrip())
+                except (ValueError, RuntimeError):
+                    pass
+            
+            # Texto alrededor del JSON: probar desde cada llave hasta dar con un objeto,
+            # así las llaves de la prosa previa ("Plan para {criterio}:") no lo impiden
+            while start >= 0:
+                try:
+                    data = _JSON_DECODER.raw_decode(text, start)[0]
+                    if isinstance(data, dict):
+                        return data
+                except ValueError:
+                    pass
+                start = text.find('{', start + 1)
+            return {}
         except:
             return {}
     
@@ -272,53 +941,35 @@ Responde ÚNICAMENTE con JSON válido en ESPAÑOL.
         return contexto
     
     def _format_evidence_for_planning(self, evidencias: Dict[str, Any]) -> str:
-        """Formatea las evidencias para la planificación."""
+        """Formatea las evidencias para la planificación.
+        
+        Siempre emite las mismas líneas en el mismo orden, con conteos acotados,
+        para que evidencias equivalentes produzcan exactamente el mismo prompt.
+        """
         if not evidencias:
             return "Evidencias no especificadas - evaluación general"
         
-        evidence_text = []
-        if evidencias.get('directories'):
-            evidence_text.append(f"Directorios disponibles: {len(evidencias['directories'])}")
-        if evidencias.get('files'):
-            evidence_text.append(f"Archivos disponibles: {len(evidencias['files'])}")
-        if evidencias.get('readme'):
-            evidence_text.append("README presente")
-        if evidencias.get('requirements'):
-            evidence_text.append("Requirements presente")
-        
-        return "\n".join(evidence_text) if evidence_text else "Evidencias limitadas"
+        limite = self.EVIDENCE_COUNT_LIMIT
+        return self.EVIDENCE_TEMPLATE.format(
+            directories=min(len(evidencias.get('directories') or ()), limite),
+            files=min(len(evidencias.get('files') or ()), limite),
+            readme="sí" if evidencias.get('readme') else "no",
+            requirements="sí" if evidencias.get('requirements') else "no"
+        )
     
     def _generate_fallback_plan(self) -> str:
-        """Genera un plan de respaldo."""
-        return json.dumps({
-            "objetivos": ["Evaluar cumplimiento del criterio"],
-            "estrategias": ["Análisis de evidencias disponibles"],
-            "criterios_especificos": {"cumplimiento": "Verificar cumplimiento básico"},
-            "evidencias_requeridas": ["Evidencias disponibles"],
-            "pasos_evaluacion": ["Análisis", "Evaluación", "Puntuación"],
-            "criterios_puntuacion": {
-                "0-25%": "Cumplimiento básico",
-                "26-50%": "Cumplimiento elemental",
-                "51-75%": "Cumplimiento intermedio",
-                "76-100%": "Cumplimiento avanzado"
-            },
-            "tiempo_estimado": 10
-        }, ensure_ascii=False)
+        """Genera un plan de respaldo (JSON precalculado al cargar el módulo)."""
+        return _FALLBACK_JSON
     
     def _create_fallback_plan(self, criterio: str) -> EvaluationPlan:
-        """Crea un plan de respaldo."""
+        """Crea un plan de respaldo; solo varía el criterio."""
         return EvaluationPlan(
             criterio=criterio,
-            objetivos=["Evaluar cumplimiento básico"],
-            estrategias=["Análisis general"],
-            criterios_especificos={"cumplimiento": "Verificar cumplimiento"},
-            evidencias_requeridas=["Evidencias disponibles"],
-            pasos_evaluacion=["Análisis", "Evaluación"],
-            criterios_puntuacion={
-                "0-25%": "Básico",
-                "26-50%": "Elemental",
-                "51-75%": "Intermedio",
-                "76-100%": "Avanzado"
-            },
+            objetivos=("Evaluar cumplimiento básico",),
+            estrategias=("Análisis general",),
+            criterios_especificos=dict(_FALLBACK_SPECIFIC),
+            evidencias_requeridas=("Evidencias disponibles",),
+            pasos_evaluacion=("Análisis", "Evaluación"),
+            criterios_puntuacion=dict(_FALLBACK_SCORING),
             tiempo_estimado=10
         )
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Caché Persistente de Respuestas LLM
+Evita repetir llamadas al modelo para prompts ya respondidos
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Agregar src al path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from config import Config
+
+class PromptCache:
+    """Caché de respuestas en SQLite indexada por el hash SHA-256 del prompt."""
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None):
+        """Abre (o crea) la base de datos de caché."""
+        self.enabled = Config.USE_CACHE if enabled is None else enabled
+        self.path = Path(path) if path else Path(Config.CACHE_DIRECTORY) / "prompts.sqlite"
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL)"
+            )
+            # Cachés creadas antes de que existiera la expiración
+            columnas = {row[1] for row in self._conn.execute("PRAGMA table_info(respuestas)")}
+            if "expira" not in columnas:
+                self._conn.execute("ALTER TABLE respuestas ADD COLUMN expira REAL")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Calcula la clave de caché a partir de todo lo que determina la respuesta."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la respuesta cacheada o None si no existe o ya expiró."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valor, expira FROM respuestas WHERE clave = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Guarda una respuesta en la caché; con ttl (segundos) expira pasado ese tiempo."""
+        if not self.enabled:
+            return
+
+        expira = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, expira) VALUES (?, ?, ?)",
+                (key, value, expira)
+            )
+            self._conn.commit()
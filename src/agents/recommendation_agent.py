@@ -5,26 +5,309 @@ Genera planes de mejora específicos para cada estudiante
 """
 
 import os
+import re
 import json
 import sys
-from typing import List, Dict, Any, Optional
+import asyncio
+import importlib
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
-import openai
-import requests
-from dotenv import load_dotenv
+from types import MappingProxyType
+import httpx
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception
 
-# Agregar src al path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Agregar src al path solo si hace falta (al importar `agents`, src ya está en él)
+try:
+    from config import Config
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from config import Config
 
-from config import Config
+from agents.prompt_cache import PromptCache
 
-# Cargar variables de entorno
-load_dotenv()
+# Las variables de entorno (.env) ya las carga config al importarse.
+# openai y requests se importan solo cuando el proveedor en uso los necesita
+_openai = None
+_requests = None
+
+def _load_openai():
+    """Importa openai la primera vez que se usa el proveedor github."""
+    global _openai
+    if _openai is None:
+        _openai = importlib.import_module("openai")
+    return _openai
+
+def _load_requests():
+    """Importa requests la primera vez que se usa el proveedor ollama."""
+    global _requests
+    if _requests is None:
+        _requests = importlib.import_module("requests")
+    return _requests
+
+class LLMServiceUnavailable(Exception):
+    """El servidor del LLM respondió con un error transitorio (429 o 5xx)."""
+
+def _is_retryable(error: BaseException) -> bool:
+    """Indica si es un error de red, de límite de tasa o del servidor que justifica reintentar."""
+    if isinstance(error, (httpx.HTTPError, LLMServiceUnavailable)):
+        return True
+    # Si el módulo no se importó, el error no puede venir de él
+    if _requests is not None and isinstance(error, _requests.RequestException):
+        return True
+    return _openai is not None and isinstance(
+        error, (_openai.APIConnectionError, _openai.RateLimitError, _openai.InternalServerError))
+
+# Cinco intentos con espera exponencial y jitter (1s, 2s, 4s... máx. 30s) para que
+# un lote concurrente no reintente al unísono tras un 429; luego se propaga el error
+_llm_retry = retry(stop=stop_after_attempt(5), wait=wait_exponential_jitter(initial=1, max=30),
+                   retry=retry_if_exception(_is_retryable), reraise=True)
+
+def _ollama_error(status_code: int, text: str) -> Exception:
+    """Construye el error de Ollama; solo 429 y 5xx se consideran transitorios."""
+    message = f"Error de Ollama: {status_code} - {text}"
+    if status_code == 429 or status_code >= 500:
+        return LLMServiceUnavailable(message)
+    return Exception(message)
+
+# orjson es opcional: parsea y serializa varias veces más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Inicio candidato de un arreglo JSON de objetos: "[" seguido de "{" o "]"
+_JSON_ARRAY_START = re.compile(r'\[\s*[{\]]')
+_JSON_DECODER = json.JSONDecoder()
+
+# Herramienta para salida estructurada: el modelo entrega las recomendaciones
+# como argumentos JSON de una llamada a función en vez de texto libre
+RECOMMENDATION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_recommendations",
+        "description": "Entrega las recomendaciones personalizadas para el estudiante.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "recomendaciones": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "titulo": {"type": "string"},
+                            "descripcion": {"type": "string"},
+                            "prioridad": {"type": "string", "enum": ["alta", "media", "baja"]},
+                            "tiempo_estimado": {"type": "string"},
+                            "recursos": {"type": "array", "items": {"type": "string"}},
+                            "pasos": {"type": "array", "items": {"type": "string"}},
+                            "criterio_relacionado": {"type": "string"},
+                            "nivel_dificultad": {"type": "string", "enum": ["principiante", "intermedio", "avanzado"]}
+                        },
+                        "required": ["titulo", "descripcion", "prioridad", "tiempo_estimado", "recursos",
+                                     "pasos", "criterio_relacionado", "nivel_dificultad"]
+                    }
+                }
+            },
+            "required": ["recomendaciones"]
+        }
+    }
+}
+RECOMMENDATION_TOOL_CHOICE = {"type": "function", "function": {"name": "emit_recommendations"}}
+
+def _loads(texto: str) -> Any:
+    """Decodifica JSON con orjson si está disponible."""
+    if orjson is not None:
+        return orjson.loads(texto)
+    return json.loads(texto)
+
+def _dumps_indented(data: Any) -> str:
+    """Serializa con sangría de 2 espacios sin escapar caracteres no ASCII."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            # Tipos que orjson no soporta (p. ej. enteros de más de 64 bits)
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+class _JsonArrayStreamScanner:
+    """Acumula texto recibido por partes y detecta el cierre del arreglo JSON de recomendaciones."""
+    
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+    
+    def feed(self, chunk: str) -> bool:
+        """Agrega un fragmento; devuelve True cuando el arreglo JSON quedó cerrado."""
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                # Las comillas antes del primer corchete no abren un string JSON
+                self.in_string = self.depth > 0
+            elif ch == '[':
+                if self.depth == 0:
+                    self.start = self.size + i
+                self.depth += 1
+            elif ch == ']' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0 and self._is_recommendation_array(chunk[:i + 1]):
+                    self.parts.append(chunk[:i + 1])
+                    self.complete = True
+                    return True
+        
+        self.parts.append(chunk)
+        self.size += len(chunk)
+        return False
+    
+    def _is_recommendation_array(self, tail: str) -> bool:
+        """Comprueba que lo cerrado sea un arreglo de objetos y no texto como "[ver abajo]"."""
+        candidate = ("".join(self.parts) + tail)[self.start:]
+        try:
+            data = _loads(candidate)
+        except ValueError:
+            return False
+        return isinstance(data, list) and all(isinstance(item, dict) for item in data)
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+# Secciones del reporte por prioridad, en orden, y semanas asignadas a cada una
+_PRIORITY_SECTIONS = (("alta", "🔴"), ("media", "🟡"), ("baja", "🟢"))
+_TIMELINE_SLOTS = (("alta", 2), ("media", 2), ("baja", 1))
+
+# Recursos de aprendizaje por criterio
+LEARNING_RESOURCES = MappingProxyType({
+    "Estructura y Configuración del Proyecto Kedro": (
+        "Documentación oficial de Kedro: https://docs.kedro.org/",
+        "Tutorial de configuración: https://docs.kedro.org/en/stable/get_started/",
+        "Ejemplos de proyectos: https://github.com/kedro-org/kedro-starters"
+    ),
+    "Implementación del Catálogo de Datos": (
+        "Catálogo de datos Kedro: https://docs.kedro.org/en/stable/data/data_catalog.html",
+        "Tipos de datasets: https://docs.kedro.org/en/stable/data/data_catalog.html#dataset-types",
+        "Configuración avanzada: https://docs.kedro.org/en/stable/data/data_catalog.html#advanced-configuration"
+    ),
+    "Desarrollo de Nodos y Funciones": (
+        "Creación de nodos: https://docs.kedro.org/en/stable/nodes_and_pipelines/nodes.html",
+        "Mejores prácticas: https://docs.kedro.org/en/stable/nodes_and_pipelines/nodes.html#best-practices",
+        "Testing de nodos: https://docs.kedro.org/en/stable/development/testing.html"
+    ),
+    "Construcción de Pipelines": (
+        "Pipelines en Kedro: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html",
+        "Diseño de pipelines: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html#designing-pipelines",
+        "Pipeline modular: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html#modular-pipelines"
+    ),
+    "Análisis Exploratorio de Datos (EDA)": (
+        "EDA con pandas: https://pandas.pydata.org/docs/user_guide/index.html",
+        "Visualización con matplotlib: https://matplotlib.org/stable/tutorials/introductory/usage.html",
+        "EDA con seaborn: https://seaborn.pydata.org/tutorial.html"
+    ),
+    "Limpieza y Tratamiento de Datos": (
+        "Data cleaning con pandas: https://pandas.pydata.org/docs/user_guide/missing_data.html",
+        "Manejo de outliers: https://pandas.pydata.org/docs/user_guide/groupby.html",
+        "Preprocessing: https://scikit-learn.org/stable/modules/preprocessing.html"
+    ),
+    "Transformación y Feature Engineering": (
+        "Feature engineering: https://scikit-learn.org/stable/modules/feature_extraction.html",
+        "Transformaciones: https://scikit-learn.org/stable/modules/preprocessing.html",
+        "Selección de features: https://scikit-learn.org/stable/modules/feature_selection.html"
+    ),
+    "Identificación de Targets para ML": (
+        "Target selection: https://scikit-learn.org/stable/supervised_learning.html",
+        "Problemas de clasificación: https://scikit-learn.org/stable/modules/classes.html#classification",
+        "Problemas de regresión: https://scikit-learn.org/stable/modules/classes.html#regression"
+    ),
+    "Documentación y Notebooks": (
+        "Jupyter notebooks: https://jupyter-notebook.readthedocs.io/en/stable/",
+        "Markdown guide: https://www.markdownguide.org/",
+        "Documentación de código: https://docs.python.org/3/tutorial/controlflow.html#documentation-strings"
+    ),
+    "Reproducibilidad y Mejores Prácticas": (
+        "Version control: https://git-scm.com/doc",
+        "Entornos virtuales: https://docs.python.org/3/tutorial/venv.html",
+        "Requirements: https://pip.pypa.io/en/stable/user_guide/#requirements-files"
+    )
+})
+
+# Los recursos no cambian entre prompts: se serializan una sola vez
+_RESOURCES_JSON = _dumps_indented(dict(LEARNING_RESOURCES))
+
+@lru_cache(maxsize=128)
+def _relevant_resources_json(criterios: Tuple[str, ...]) -> str:
+    """Serializa solo los recursos de los criterios indicados (en el orden de la tabla)."""
+    return _dumps_indented({criterio: LEARNING_RESOURCES[criterio] for criterio in criterios})
+
+# Vocabulario fijo de criterios, prioridades y niveles: los valores parseados se
+# reemplazan por la copia internada para no duplicar cadenas en cada respuesta
+_VOCABULARY = {
+    sys.intern(valor): sys.intern(valor)
+    for valor in (*LEARNING_RESOURCES, "alta", "media", "baja", "principiante", "intermedio", "avanzado")
+}
+
+def _intern_value(valor):
+    """Devuelve la copia internada si el valor pertenece al vocabulario fijo."""
+    return _VOCABULARY.get(valor, valor) if isinstance(valor, str) else valor
+
+# Objetivos de aprendizaje base por nivel
+BASE_OBJECTIVES = MappingProxyType({
+    "principiante": (
+        "Completar configuración básica del proyecto",
+        "Implementar análisis exploratorio de datos",
+        "Crear documentación básica"
+    ),
+    "intermedio": (
+        "Optimizar arquitectura del proyecto",
+        "Implementar pipelines robustos",
+        "Mejorar calidad del código"
+    ),
+    "avanzado": (
+        "Implementar mejores prácticas avanzadas",
+        "Optimizar rendimiento del sistema",
+        "Crear documentación técnica completa"
+    )
+})
+
+# Recursos generales por nivel
+GENERAL_RESOURCES = MappingProxyType({
+    "principiante": (
+        "Python básico: https://docs.python.org/3/tutorial/",
+        "Pandas tutorial: https://pandas.pydata.org/docs/getting_started/intro_tutorials/",
+        "Kedro getting started: https://docs.kedro.org/en/stable/get_started/"
+    ),
+    "intermedio": (
+        "Scikit-learn user guide: https://scikit-learn.org/stable/user_guide.html",
+        "Kedro advanced: https://docs.kedro.org/en/stable/advanced_topics/",
+        "Machine Learning patterns: https://scikit-learn.org/stable/modules/classes.html"
+    ),
+    "avanzado": (
+        "MLOps best practices: https://ml-ops.org/",
+        "Kedro deployment: https://docs.kedro.org/en/stable/deployment/",
+        "Advanced ML techniques: https://scikit-learn.org/stable/modules/ensemble.html"
+    )
+})
 
 @dataclass
 class PersonalizedRecommendation:
     """Recomendación personalizada para un estudiante."""
+    # __slots__ explícito (compatible con Python 3.8): sin __dict__ por instancia
+    __slots__ = ('titulo', 'descripcion', 'prioridad', 'tiempo_estimado', 'recursos', 'pasos',
+                 'criterio_relacionado', 'nivel_dificultad')
+    
     titulo: str
     descripcion: str
     prioridad: str  # "alta", "media", "baja"
@@ -37,6 +320,8 @@ class PersonalizedRecommendation:
 @dataclass
 class LearningPath:
     """Plan de aprendizaje personalizado."""
+    __slots__ = ('estudiante', 'nivel_actual', 'objetivos', 'recomendaciones', 'cronograma', 'recursos_generales')
+    
     estudiante: str
     nivel_actual: str
     objetivos: List[str]
@@ -45,7 +330,26 @@ class LearningPath:
     recursos_generales: List[str]
 
 class RecommendationAgent:
-    """Agente que genera recomendaciones personalizadas."""
+    """Agente que genera recomendaciones personalizadas.
+    
+    generate_batch y create_learning_paths envían las solicitudes de varios
+    estudiantes de forma concurrente. Con Ollama, el servidor atiende en
+    paralelo tantas como indique OLLAMA_NUM_PARALLEL (se configura al iniciar
+    `ollama serve`).
+    """
+    
+    SYSTEM_PROMPT = "Eres un mentor personalizado de Machine Learning que crea planes de mejora específicos y accionables. Tus recomendaciones son prácticas, detalladas y adaptadas al nivel del estudiante."
+    
+    # Ollama no recibe mensaje de sistema: las instrucciones van antes del prompt
+    OLLAMA_INSTRUCTIONS = "Eres un mentor personalizado de Machine Learning que crea planes de mejora específicos y accionables. SIEMPRE responde en ESPAÑOL. Tus recomendaciones son prácticas, detalladas y adaptadas al nivel del estudiante."
+    
+    # Partes fijas de cada solicitud, construidas una sola vez (solo lectura)
+    SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+    OLLAMA_PROMPT_PREFIX = OLLAMA_INSTRUCTIONS + "\n\n"
+    OLLAMA_OPTIONS = {"temperature": 0.3, "num_predict": 4000}
+    
+    # Solicitudes al LLM en curso a la vez al crear planes de un curso completo
+    MAX_CONCURRENT_REQUESTS = 16
     
     def __init__(self):
         """Inicializa el agente con configuración centralizada."""
@@ -56,7 +360,7 @@ class RecommendationAgent:
         self.ollama_url = None
         
         if self.provider == "github":
-            self.client = openai.OpenAI(
+            self.client = _load_openai().OpenAI(
                 base_url=Config.LLM_PROVIDERS["github"]["base_url"],
                 api_key=Config.GITHUB_TOKEN
             )
@@ -64,122 +368,275 @@ class RecommendationAgent:
         elif self.provider == "ollama":
             self.ollama_url = Config.LLM_PROVIDERS["ollama"]["base_url"]
             self.model = "llama3:latest"
+            
+            # Sesión persistente: reutiliza conexiones keep-alive entre llamadas
+            requests = _load_requests()
+            self.session = requests.Session()
+            self.session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
         else:
             # Fallback a GitHub Models
-            self.client = openai.OpenAI(
+            self.client = _load_openai().OpenAI(
                 base_url=Config.LLM_PROVIDERS["github"]["base_url"],
                 api_key=Config.GITHUB_TOKEN
             )
             self.model = "gpt-4o-mini"
         
-        # Recursos de aprendizaje por criterio
-        self.learning_resources = {
-            "Estructura y Configuración del Proyecto Kedro": [
-                "Documentación oficial de Kedro: https://docs.kedro.org/",
-                "Tutorial de configuración: https://docs.kedro.org/en/stable/get_started/",
-                "Ejemplos de proyectos: https://github.com/kedro-org/kedro-starters"
-            ],
-            "Implementación del Catálogo de Datos": [
-                "Catálogo de datos Kedro: https://docs.kedro.org/en/stable/data/data_catalog.html",
-                "Tipos de datasets: https://docs.kedro.org/en/stable/data/data_catalog.html#dataset-types",
-                "Configuración avanzada: https://docs.kedro.org/en/stable/data/data_catalog.html#advanced-configuration"
-            ],
-            "Desarrollo de Nodos y Funciones": [
-                "Creación de nodos: https://docs.kedro.org/en/stable/nodes_and_pipelines/nodes.html",
-                "Mejores prácticas: https://docs.kedro.org/en/stable/nodes_and_pipelines/nodes.html#best-practices",
-                "Testing de nodos: https://docs.kedro.org/en/stable/development/testing.html"
-            ],
-            "Construcción de Pipelines": [
-                "Pipelines en Kedro: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html",
-                "Diseño de pipelines: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html#designing-pipelines",
-                "Pipeline modular: https://docs.kedro.org/en/stable/nodes_and_pipelines/pipelines.html#modular-pipelines"
-            ],
-            "Análisis Exploratorio de Datos (EDA)": [
-                "EDA con pandas: https://pandas.pydata.org/docs/user_guide/index.html",
-                "Visualización con matplotlib: https://matplotlib.org/stable/tutorials/introductory/usage.html",
-                "EDA con seaborn: https://seaborn.pydata.org/tutorial.html"
-            ],
-            "Limpieza y Tratamiento de Datos": [
-                "Data cleaning con pandas: https://pandas.pydata.org/docs/user_guide/missing_data.html",
-                "Manejo de outliers: https://pandas.pydata.org/docs/user_guide/groupby.html",
-                "Preprocessing: https://scikit-learn.org/stable/modules/preprocessing.html"
-            ],
-            "Transformación y Feature Engineering": [
-                "Feature engineering: https://scikit-learn.org/stable/modules/feature_extraction.html",
-                "Transformaciones: https://scikit-learn.org/stable/modules/preprocessing.html",
-                "Selección de features: https://scikit-learn.org/stable/modules/feature_selection.html"
-            ],
-            "Identificación de Targets para ML": [
-                "Target selection: https://scikit-learn.org/stable/supervised_learning.html",
-                "Problemas de clasificación: https://scikit-learn.org/stable/modules/classes.html#classification",
-                "Problemas de regresión: https://scikit-learn.org/stable/modules/classes.html#regression"
-            ],
-            "Documentación y Notebooks": [
-                "Jupyter notebooks: https://jupyter-notebook.readthedocs.io/en/stable/",
-                "Markdown guide: https://www.markdownguide.org/",
-                "Documentación de código: https://docs.python.org/3/tutorial/controlflow.html#documentation-strings"
-            ],
-            "Reproducibilidad y Mejores Prácticas": [
-                "Version control: https://git-scm.com/doc",
-                "Entornos virtuales: https://docs.python.org/3/tutorial/venv.html",
-                "Requirements: https://pip.pypa.io/en/stable/user_guide/#requirements-files"
-            ]
-        }
+        # Caché persistente de respuestas por prompt
+        self.cache = PromptCache()
+        
+        # Recursos de aprendizaje por criterio (tabla compartida, solo lectura)
+        self.learning_resources = LEARNING_RESOURCES
     
-    def generate_personalized_recommendations(self, evaluation: Dict, student_info: Optional[Dict] = None) -> List[PersonalizedRecommendation]:
-        """Genera recomendaciones personalizadas para un estudiante."""
+    def generate_personalized_recommendations(self, evaluation: Dict, student_info: Optional[Dict] = None,
+                                              evaluation_json: Optional[str] = None) -> List[PersonalizedRecommendation]:
+        """Genera recomendaciones personalizadas para un estudiante.
         
-        prompt = self._build_recommendation_prompt(evaluation, student_info)
+        evaluation_json, si se entrega, es la evaluación ya serializada (JSON con
+        sangría de 2) y se usa tal cual en el prompt.
+        """
+        
+        prompt = self._build_recommendation_prompt(evaluation, student_info, evaluation_json)
+        
+        cache_key = self._cache_key(prompt)
+        cached = self._get_cached_recommendations(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            if self.provider == "github":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Eres un mentor personalizado de Machine Learning que crea planes de mejora específicos y accionables. Tus recomendaciones son prácticas, detalladas y adaptadas al nivel del estudiante."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3
-                )
-                recommendations_text = response.choices[0].message.content
-                
-            elif self.provider == "ollama":
-                # Ollama API call
-                ollama_payload = {
-                    "model": self.model,
-                    "prompt": f"Eres un mentor personalizado de Machine Learning que crea planes de mejora específicos y accionables. SIEMPRE responde en ESPAÑOL. Tus recomendaciones son prácticas, detalladas y adaptadas al nivel del estudiante.\n\n{prompt}",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 4000
-                    }
-                }
-                
-                response = requests.post(
-                    f"{self.ollama_url}/api/generate",
-                    json=ollama_payload,
-                    timeout=120
-                )
-                
-                if response.status_code == 200:
-                    recommendations_text = response.json()["response"]
-                else:
-                    raise Exception(f"Error de Ollama: {response.status_code} - {response.text}")
+            recommendations_text = self._request_recommendations(prompt)
+            return self._store_recommendations(cache_key, recommendations_text)
             
-            return self._parse_recommendations(recommendations_text)
+        except Exception as e:
+            print(f"Error generando recomendaciones: {e}")
+            return []
+    
+    async def agenerate_personalized_recommendations(self, evaluation: Dict, student_info: Optional[Dict] = None,
+                                                     client=None) -> List[PersonalizedRecommendation]:
+        """Versión asíncrona de generate_personalized_recommendations.
+        
+        Si no se entrega un cliente asíncrono se crea uno solo para esta llamada.
+        """
+        
+        if client is None:
+            async with self._create_async_client() as client:
+                return await self.agenerate_personalized_recommendations(evaluation, student_info, client)
+        
+        prompt = self._build_recommendation_prompt(evaluation, student_info)
+        
+        cache_key = self._cache_key(prompt)
+        cached = self._get_cached_recommendations(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            recommendations_text = await self._arequest_recommendations(prompt, client)
+            return self._store_recommendations(cache_key, recommendations_text)
             
         except Exception as e:
             print(f"Error generando recomendaciones: {e}")
             return []
     
+    @_llm_retry
+    def _request_recommendations(self, prompt: str) -> str:
+        """Llama al LLM y devuelve el texto con las recomendaciones; reintenta errores transitorios."""
+        if self.provider == "github":
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._chat_messages(prompt),
+                temperature=0.3,
+                tools=[RECOMMENDATION_TOOL],
+                tool_choice=RECOMMENDATION_TOOL_CHOICE
+            )
+            return self._message_text(response.choices[0].message)
+        
+        # Se deja de leer en cuanto el arreglo JSON queda completo
+        scanner = _JsonArrayStreamScanner()
+        with self.session.post(
+            f"{self.ollama_url}/api/generate",
+            json=self._ollama_payload(prompt),
+            timeout=120,
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                raise _ollama_error(response.status_code, response.text)
+            
+            for line in response.iter_lines():
+                if line and scanner.feed(_loads(line).get("response", "")):
+                    break
+        return scanner.text
+    
+    @_llm_retry
+    async def _arequest_recommendations(self, prompt: str, client) -> str:
+        """Versión asíncrona de _request_recommendations."""
+        if self.provider == "github":
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=self._chat_messages(prompt),
+                temperature=0.3,
+                tools=[RECOMMENDATION_TOOL],
+                tool_choice=RECOMMENDATION_TOOL_CHOICE
+            )
+            return self._message_text(response.choices[0].message)
+        
+        scanner = _JsonArrayStreamScanner()
+        async with client.stream(
+            "POST",
+            f"{self.ollama_url}/api/generate",
+            json=self._ollama_payload(prompt)
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise _ollama_error(response.status_code, response.text)
+            
+            async for line in response.aiter_lines():
+                if line and scanner.feed(_loads(line).get("response", "")):
+                    break
+        return scanner.text
+    
+    def generate_batch(self, items: List[Tuple[Dict, Optional[Dict]]]) -> List[List[PersonalizedRecommendation]]:
+        """Genera recomendaciones para varios pares (evaluación, estudiante) en paralelo.
+        
+        Devuelve una lista de recomendaciones por par, en el mismo orden.
+        """
+        
+        if not items:
+            return []
+        return asyncio.run(self.agenerate_batch(items))
+    
+    async def agenerate_batch(self, items: List[Tuple[Dict, Optional[Dict]]]) -> List[List[PersonalizedRecommendation]]:
+        """Versión asíncrona de generate_batch: un cliente compartido para todas las llamadas.
+        
+        Como en acreate_learning_paths, a lo más MAX_CONCURRENT_REQUESTS
+        solicitudes al LLM quedan en curso a la vez.
+        """
+        
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        async with self._create_async_client() as client:
+            async def generate_one(evaluation: Dict, student_info: Optional[Dict]) -> List[PersonalizedRecommendation]:
+                async with semaphore:
+                    return await self.agenerate_personalized_recommendations(evaluation, student_info, client)
+            
+            return list(await asyncio.gather(*[
+                generate_one(evaluation, student_info) for evaluation, student_info in items
+            ]))
+    
+    def _cache_key(self, prompt: str) -> str:
+        """Clave de caché: proveedor, modelo, instrucciones y prompt completo."""
+        instrucciones = self.OLLAMA_INSTRUCTIONS if self.provider == "ollama" else self.SYSTEM_PROMPT
+        return PromptCache.make_key(self.provider, self.model, instrucciones, prompt)
+    
+    def _get_cached_recommendations(self, cache_key: str) -> Optional[List[PersonalizedRecommendation]]:
+        """Devuelve las recomendaciones cacheadas para la clave, si existen."""
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        return self._parse_recommendations(cached)
+    
+    def _store_recommendations(self, cache_key: str, recommendations_text: str) -> List[PersonalizedRecommendation]:
+        """Parsea la respuesta y la guarda en caché solo si produjo recomendaciones."""
+        recommendations = self._parse_recommendations(recommendations_text)
+        if recommendations:
+            self.cache.set(cache_key, recommendations_text)
+        return recommendations
+    
+    def _message_text(self, message) -> str:
+        """Arreglo JSON de recomendaciones de un mensaje de chat, priorizando la llamada a emit_recommendations.
+        
+        Los argumentos de la herramienta se normalizan al mismo arreglo JSON que
+        devuelve Ollama, de modo que caché y parseo no distinguen el origen.
+        """
+        if message.tool_calls:
+            arguments = _loads(message.tool_calls[0].function.arguments)
+            return json.dumps(arguments.get('recomendaciones', []), ensure_ascii=False)
+        
+        # El modelo respondió en texto libre
+        return message.content or ""
+    
+    def _chat_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Mensajes para la API de chat (GitHub Models)."""
+        return [self.SYSTEM_MESSAGE, {"role": "user", "content": prompt}]
+    
+    def _ollama_payload(self, prompt: str) -> Dict[str, Any]:
+        """Cuerpo de la solicitud a /api/generate de Ollama."""
+        return {
+            "model": self.model,
+            "prompt": self.OLLAMA_PROMPT_PREFIX + prompt,
+            "stream": True,
+            "options": self.OLLAMA_OPTIONS
+        }
+    
+    def _create_async_client(self):
+        """Cliente asíncrono según el proveedor (usable con async with)."""
+        if self.client is not None:
+            return _load_openai().AsyncOpenAI(
+                base_url=Config.LLM_PROVIDERS["github"]["base_url"],
+                api_key=Config.GITHUB_TOKEN
+            )
+        return httpx.AsyncClient(timeout=120)
+    
     def create_learning_path(self, evaluations: List[Dict], student_info: Dict) -> LearningPath:
         """Crea un plan de aprendizaje completo para un estudiante."""
         
-        # Analizar evaluaciones del estudiante
-        promedio_nota = sum(e.get('nota_final', 0) for e in evaluations) / len(evaluations)
+        nivel_actual, latest_evaluation = self._analyze_history(evaluations)
+        
+        # Generar recomendaciones para la evaluación más reciente
+        recommendations = self.generate_personalized_recommendations(latest_evaluation, student_info)
+        
+        return self._build_learning_path(student_info, nivel_actual, latest_evaluation, recommendations)
+    
+    async def acreate_learning_path(self, evaluations: List[Dict], student_info: Dict, client=None) -> LearningPath:
+        """Versión asíncrona de create_learning_path."""
+        
+        nivel_actual, latest_evaluation = self._analyze_history(evaluations)
+        recommendations = await self.agenerate_personalized_recommendations(latest_evaluation, student_info, client)
+        
+        return self._build_learning_path(student_info, nivel_actual, latest_evaluation, recommendations)
+    
+    def create_learning_paths(self, cohort: List[Tuple[List[Dict], Dict]]) -> List[LearningPath]:
+        """Crea los planes de aprendizaje de un curso con llamadas concurrentes.
+        
+        Recibe pares (evaluaciones, información del estudiante) y devuelve los
+        planes en el mismo orden.
+        """
+        
+        if not cohort:
+            return []
+        return asyncio.run(self.acreate_learning_paths(cohort))
+    
+    async def acreate_learning_paths(self, cohort: List[Tuple[List[Dict], Dict]]) -> List[LearningPath]:
+        """Versión asíncrona de create_learning_paths.
+        
+        Como mucho MAX_CONCURRENT_REQUESTS solicitudes al LLM quedan en curso a
+        la vez, para respetar los límites de tasa del proveedor.
+        """
+        
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        async with self._create_async_client() as client:
+            async def create_one(evaluations: List[Dict], student_info: Dict) -> LearningPath:
+                async with semaphore:
+                    return await self.acreate_learning_path(evaluations, student_info, client)
+            
+            return list(await asyncio.gather(*[
+                create_one(evaluations, student_info) for evaluations, student_info in cohort
+            ]))
+    
+    def _analyze_history(self, evaluations: List[Dict]) -> Tuple[str, Dict]:
+        """Nivel actual del estudiante y su evaluación más reciente."""
+        
+        # Promedio y evaluación más reciente en una pasada
+        # (ante fechas iguales se queda con la primera, como max)
+        total = 0
+        latest_evaluation = None
+        latest_fecha = None
+        for evaluation in evaluations:
+            total += evaluation.get('nota_final', 0)
+            fecha = evaluation.get('fecha_evaluacion', '')
+            if latest_evaluation is None or fecha > latest_fecha:
+                latest_evaluation = evaluation
+                latest_fecha = fecha
+        promedio_nota = total / len(evaluations)
         
         # Determinar nivel actual
         if promedio_nota >= 6.0:
@@ -189,9 +646,11 @@ class RecommendationAgent:
         else:
             nivel_actual = "principiante"
         
-        # Generar recomendaciones para la evaluación más reciente
-        latest_evaluation = max(evaluations, key=lambda x: x.get('fecha_evaluacion', ''))
-        recommendations = self.generate_personalized_recommendations(latest_evaluation, student_info)
+        return nivel_actual, latest_evaluation
+    
+    def _build_learning_path(self, student_info: Dict, nivel_actual: str, latest_evaluation: Dict,
+                             recommendations: List[PersonalizedRecommendation]) -> LearningPath:
+        """Arma el plan de aprendizaje a partir de las recomendaciones obtenidas."""
         
         # Crear objetivos basados en el nivel
         objetivos = self._generate_learning_objectives(nivel_actual, latest_evaluation)
@@ -211,8 +670,13 @@ class RecommendationAgent:
             recursos_generales=recursos_generales
         )
     
-    def _build_recommendation_prompt(self, evaluation: Dict, student_info: Optional[Dict] = None) -> str:
-        """Construye prompt para recomendaciones personalizadas."""
+    def _build_recommendation_prompt(self, evaluation: Dict, student_info: Optional[Dict] = None,
+                                     evaluation_json: Optional[str] = None) -> str:
+        """Construye prompt para recomendaciones personalizadas.
+        
+        Las instrucciones fijas van al inicio y los datos del estudiante al final,
+        para que el prefijo se repita entre estudiantes y el proveedor lo cachee.
+        """
         
         student_context = ""
         if student_info:
@@ -224,15 +688,7 @@ INFORMACIÓN DEL ESTUDIANTE:
 """
         
         prompt = f"""
-Genera recomendaciones personalizadas de mejora para este proyecto de Machine Learning:
-
-{student_context}
-
-EVALUACIÓN ACTUAL:
-{json.dumps(evaluation, indent=2, ensure_ascii=False)}
-
-RECURSOS DISPONIBLES POR CRITERIO:
-{json.dumps(self.learning_resources, indent=2, ensure_ascii=False)}
+Genera recomendaciones personalizadas de mejora para el proyecto de Machine Learning cuya evaluación se entrega al final.
 
 INSTRUCCIONES:
 1. Enfócate en los criterios con menor puntuación
@@ -255,70 +711,91 @@ FORMATO DE RESPUESTA (JSON):
         "nivel_dificultad": "intermedio"
     }}
 ]
+
+RECURSOS DISPONIBLES POR CRITERIO:
+{self._resources_for_prompt(evaluation)}
+{student_context}
+EVALUACIÓN ACTUAL:
+{evaluation_json or _dumps_indented(evaluation)}
 """
         return prompt
     
+    def _resources_for_prompt(self, evaluation: Dict) -> str:
+        """Recursos de los criterios evaluados; si ninguno coincide se envía la tabla completa.
+        
+        Los recursos de criterios ajenos a la evaluación solo agregan tokens al prompt.
+        """
+        evaluados = {c.get('criterio') for c in evaluation.get('criterios', [])}
+        criterios = tuple(criterio for criterio in LEARNING_RESOURCES if criterio in evaluados)
+        if not criterios:
+            return _RESOURCES_JSON
+        return _relevant_resources_json(criterios)
+    
     def _parse_recommendations(self, recommendations_text: str) -> List[PersonalizedRecommendation]:
         """Parsea la respuesta del LLM en objetos PersonalizedRecommendation."""
         try:
-            # Buscar JSON en la respuesta
-            start = recommendations_text.find('[')
-            end = recommendations_text.rfind(']') + 1
-            json_str = recommendations_text[start:end]
-            
-            recommendations_data = json.loads(json_str)
-            recommendations = []
-            
-            for rec_data in recommendations_data:
-                recommendation = PersonalizedRecommendation(
-                    titulo=rec_data.get('titulo', ''),
-                    descripcion=rec_data.get('descripcion', ''),
-                    prioridad=rec_data.get('prioridad', 'media'),
-                    tiempo_estimado=rec_data.get('tiempo_estimado', ''),
-                    recursos=rec_data.get('recursos', []),
-                    pasos=rec_data.get('pasos', []),
-                    criterio_relacionado=rec_data.get('criterio_relacionado', ''),
-                    nivel_dificultad=rec_data.get('nivel_dificultad', 'intermedio')
-                )
-                recommendations.append(recommendation)
-            
-            return recommendations
+            return self._build_recommendations(self._extract_json_array(recommendations_text))
             
         except Exception as e:
             print(f"Error parseando recomendaciones: {e}")
             return []
     
+    def _extract_json_array(self, text: str) -> List[Dict]:
+        """Extrae el primer arreglo JSON válido de la respuesta del LLM.
+        
+        Si la respuesta es solo el arreglo se decodifica de una vez; si no, se
+        prueba cada "[" candidato con raw_decode, de modo que corchetes sueltos
+        en el texto o texto después del JSON no rompan el parseo.
+        """
+        stripped = text.strip()
+        if stripped.startswith('[') and stripped.endswith(']'):
+            try:
+                data = _loads(stripped)
+            except ValueError:
+                data = None
+            if isinstance(data, list):
+                return data
+        
+        for match in _JSON_ARRAY_START.finditer(text):
+            try:
+                data, _ = _JSON_DECODER.raw_decode(text, match.start())
+            except ValueError:
+                continue
+            if isinstance(data, list):
+                return data
+        
+        raise ValueError("No se encontró un arreglo JSON en la respuesta")
+    
+    def _build_recommendations(self, recommendations_data: List[Dict]) -> List[PersonalizedRecommendation]:
+        """Construye objetos PersonalizedRecommendation desde diccionarios."""
+        return [
+            PersonalizedRecommendation(
+                titulo=rec_data.get('titulo', ''),
+                descripcion=rec_data.get('descripcion', ''),
+                prioridad=_intern_value(rec_data.get('prioridad', 'media')),
+                tiempo_estimado=rec_data.get('tiempo_estimado', ''),
+                recursos=rec_data.get('recursos', []),
+                pasos=rec_data.get('pasos', []),
+                criterio_relacionado=_intern_value(rec_data.get('criterio_relacionado', '')),
+                nivel_dificultad=_intern_value(rec_data.get('nivel_dificultad', 'intermedio'))
+            )
+            for rec_data in recommendations_data
+        ]
+    
     def _generate_learning_objectives(self, nivel: str, evaluation: Dict) -> List[str]:
         """Genera objetivos de aprendizaje basados en el nivel."""
         
-        base_objectives = {
-            "principiante": [
-                "Completar configuración básica del proyecto",
-                "Implementar análisis exploratorio de datos",
-                "Crear documentación básica"
-            ],
-            "intermedio": [
-                "Optimizar arquitectura del proyecto",
-                "Implementar pipelines robustos",
-                "Mejorar calidad del código"
-            ],
-            "avanzado": [
-                "Implementar mejores prácticas avanzadas",
-                "Optimizar rendimiento del sistema",
-                "Crear documentación técnica completa"
-            ]
-        }
-        
-        # Agregar objetivos específicos basados en criterios débiles
-        criterios_debiles = [
-            c['criterio'] for c in evaluation.get('criterios', []) 
-            if c.get('puntuacion', 0) < 60
-        ]
+        # Agregar objetivos específicos basados en criterios débiles (solo se usan los 3 primeros)
+        criterios_debiles = list(islice(
+            (c['criterio'] for c in evaluation.get('criterios', []) if c.get('puntuacion', 0) < 60),
+            3
+        ))
         
-        objectives = base_objectives.get(nivel, base_objectives["intermedio"])
+        # Copia: la tabla compartida no debe acumular objetivos de otros estudiantes
+        objectives = list(BASE_OBJECTIVES.get(nivel, BASE_OBJECTIVES["intermedio"]))
         
         if criterios_debiles:
-            objectives.append(f"Mejorar: {', '.join(criterios_debiles[:3])}")
+            objectives.append(f"Mejorar: {', '.join(criterios_debiles)}")
         
         return objectives
     
@@ -328,111 +805,87 @@ FORMATO DE RESPUESTA (JSON):
         timeline = {}
         current_week = 1
         
-        # Agrupar por prioridad
-        high_priority = [r for r in recommendations if r.prioridad == "alta"]
-        medium_priority = [r for r in recommendations if r.prioridad == "media"]
-        low_priority = [r for r in recommendations if r.prioridad == "baja"]
-        
-        # Asignar semanas
-        for rec in high_priority[:2]:  # Máximo 2 por semana
-            timeline[f"Semana {current_week}"] = rec.titulo
-            current_week += 1
+        by_priority = self._group_by_priority(recommendations)
         
-        for rec in medium_priority[:2]:
-            timeline[f"Semana {current_week}"] = rec.titulo
-            current_week += 1
-        
-        for rec in low_priority[:1]:
-            timeline[f"Semana {current_week}"] = rec.titulo
-            current_week += 1
+        # Asignar semanas: hasta 2 de prioridad alta, 2 de media y 1 de baja
+        for prioridad, limite in _TIMELINE_SLOTS:
+            for rec in by_priority[prioridad][:limite]:
+                timeline[f"Semana {current_week}"] = rec.titulo
+                current_week += 1
         
         return timeline
     
+    def _group_by_priority(self, recommendations: List[PersonalizedRecommendation]) -> Dict[str, List[PersonalizedRecommendation]]:
+        """Agrupa las recomendaciones por prioridad en una sola pasada.
+        
+        Las prioridades desconocidas se tratan como "media", el valor por defecto al parsear.
+        """
+        by_priority = {"alta": [], "media": [], "baja": []}
+        for rec in recommendations:
+            by_priority.get(rec.prioridad, by_priority["media"]).append(rec)
+        return by_priority
+    
     def _get_general_resources(self, nivel: str) -> List[str]:
         """Obtiene recursos generales según el nivel."""
         
-        resources = {
-            "principiante": [
-                "Python básico: https://docs.python.org/3/tutorial/",
-                "Pandas tutorial: https://pandas.pydata.org/docs/getting_started/intro_tutorials/",
-                "Kedro getting started: https://docs.kedro.org/en/stable/get_started/"
-            ],
-            "intermedio": [
-                "Scikit-learn user guide: https://scikit-learn.org/stable/user_guide.html",
-                "Kedro advanced: https://docs.kedro.org/en/stable/advanced_topics/",
-                "Machine Learning patterns: https://scikit-learn.org/stable/modules/classes.html"
-            ],
-            "avanzado": [
-                "MLOps best practices: https://ml-ops.org/",
-                "Kedro deployment: https://docs.kedro.org/en/stable/deployment/",
-                "Advanced ML techniques: https://scikit-learn.org/stable/modules/ensemble.html"
-            ]
-        }
-        
-        return resources.get(nivel, resources["intermedio"])
+        return list(GENERAL_RESOURCES.get(nivel, GENERAL_RESOURCES["intermedio"]))
     
     def generate_learning_path_report(self, learning_path: LearningPath) -> str:
         """Genera un reporte del plan de aprendizaje."""
         
-        report = f"""# 🎯 Plan de Aprendizaje Personalizado
+        now = datetime.now()
+        parts = [f"""# 🎯 Plan de Aprendizaje Personalizado
 
 **Estudiante:** {learning_path.estudiante}  
 **Nivel Actual:** {learning_path.nivel_actual.title()}  
-**Fecha:** {datetime.now().strftime('%d/%m/%Y')}
+**Fecha:** {now.strftime('%d/%m/%Y')}
 
 ## 📋 Objetivos de Aprendizaje
 
-"""
+"""]
         
-        for i, objetivo in enumerate(learning_path.objetivos, 1):
-            report += f"{i}. {objetivo}\n"
+        parts.extend(f"{i}. {objetivo}\n" for i, objetivo in enumerate(learning_path.objetivos, 1))
         
-        report += "\n## 🗓️ Cronograma Recomendado\n\n"
+        parts.append("\n## 🗓️ Cronograma Recomendado\n\n")
         
-        for semana, tarea in learning_path.cronograma.items():
-            report += f"- **{semana}:** {tarea}\n"
+        parts.extend(f"- **{semana}:** {tarea}\n" for semana, tarea in learning_path.cronograma.items())
         
-        report += "\n## 💡 Recomendaciones Específicas\n\n"
+        parts.append("\n## 💡 Recomendaciones Específicas\n\n")
         
-        # Agrupar por prioridad
-        by_priority = {"alta": [], "media": [], "baja": []}
-        for rec in learning_path.recomendaciones:
-            by_priority[rec.prioridad].append(rec)
+        by_priority = self._group_by_priority(learning_path.recomendaciones)
         
-        for prioridad in ["alta", "media", "baja"]:
+        for prioridad, emoji in _PRIORITY_SECTIONS:
             if by_priority[prioridad]:
-                emoji = {"alta": "🔴", "media": "🟡", "baja": "🟢"}[prioridad]
-                report += f"### {emoji} Prioridad {prioridad.title()}\n\n"
+                parts.append(f"### {emoji} Prioridad {prioridad.title()}\n\n")
                 
                 for rec in by_priority[prioridad]:
-                    report += f"#### {rec.titulo}\n\n"
-                    report += f"**Criterio:** {rec.criterio_relacionado}\n"
-                    report += f"**Tiempo estimado:** {rec.tiempo_estimado}\n"
-                    report += f"**Nivel:** {rec.nivel_dificultad}\n\n"
-                    report += f"{rec.descripcion}\n\n"
+                    parts.append(
+                        f"#### {rec.titulo}\n\n"
+                        f"**Criterio:** {rec.criterio_relacionado}\n"
+                        f"**Tiempo estimado:** {rec.tiempo_estimado}\n"
+                        f"**Nivel:** {rec.nivel_dificultad}\n\n"
+                        f"{rec.descripcion}\n\n"
+                    )
                     
                     if rec.pasos:
-                        report += "**Pasos a seguir:**\n"
-                        for paso in rec.pasos:
-                            report += f"- {paso}\n"
-                        report += "\n"
+                        parts.append("**Pasos a seguir:**\n")
+                        parts.extend(f"- {paso}\n" for paso in rec.pasos)
+                        parts.append("\n")
                     
                     if rec.recursos:
-                        report += "**Recursos:**\n"
-                        for recurso in rec.recursos:
-                            report += f"- {recurso}\n"
-                        report += "\n"
+                        parts.append("**Recursos:**\n")
+                        parts.extend(f"- {recurso}\n" for recurso in rec.recursos)
+                        parts.append("\n")
                     
-                    report += "---\n\n"
+                    parts.append("---\n\n")
         
-        report += "\n## 📚 Recursos Generales\n\n"
+        parts.append("\n## 📚 Recursos Generales\n\n")
         
-        for recurso in learning_path.recursos_generales:
-            report += f"- {recurso}\n"
+        parts.extend(f"- {recurso}\n" for recurso in learning_path.recursos_generales)
         
-        report += f"\n---\n\n*Plan generado automáticamente el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}*"
+        parts.append(f"\n---\n\n*Plan generado automáticamente el {now.strftime('%d/%m/%Y a las %H:%M')}*")
         
-        return report
+        return "".join(parts)
 
 
 # Ejemplo de uso
@@ -7,121 +7,283 @@ Coordina todos los agentes para crear un sistema completo de evaluación intelig
 import os
 import sys
 import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from dataclasses import asdict
 from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 # Agregar src al path
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
-from agents import AnalysisAgent, RecommendationAgent, MonitoringAgent
+from agents import AnalysisAgent, RecommendationAgent, MonitoringAgent, PromptCache
 from rubrica_evaluator import RubricaEvaluator, create_kedro_rubrica
 from config import Config
 
+# orjson es opcional: serializa los resultados varias veces más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Mensajes de progreso por logging: se silencian con
+# logging.getLogger("agents_manager").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    # Sin propagar: si otro módulo configuró el logger raíz, los mensajes no salen dos veces
+    logger.propagate = False
+
+# Campos que cambian en cada corrida y no aportan al LLM: se quitan de lo que
+# reciben los agentes con LLM para que sus prompts (y su caché) se repitan
+_VOLATILE_FIELDS = ("fecha_evaluacion", "tiempo_evaluacion")
+
+def _prompt_view(evaluation_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia de la evaluación sin los campos volátiles."""
+    return {k: v for k, v in evaluation_dict.items() if k not in _VOLATILE_FIELDS}
+
+def _repo_slug(repo_url: str) -> str:
+    """Nombre de archivo para un repositorio: owner_repo (los forks de una misma plantilla no chocan)."""
+    path = repo_url.strip().rstrip('/')
+    if path.endswith('.git'):
+        path = path[:-4]
+    return "_".join(path.split('/')[-2:])
+
+def _write_json(path: Path, data: Any):
+    """Escribe JSON con sangría de 2 espacios, sin escapar caracteres no ASCII."""
+    if orjson is not None:
+        try:
+            path.write_bytes(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            return
+        except TypeError:
+            # Tipos que orjson no soporta (p. ej. enteros de más de 64 bits)
+            pass
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
+# Plantillas de reportes: se compilan la primera vez y quedan en caché; autoescape
+# evita que nombres de repositorios o textos del LLM inyecten HTML
+_TEMPLATES = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "templates"),
+    autoescape=select_autoescape(["html", "html.j2"]),
+    auto_reload=False,
+    cache_size=-1,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=True
+)
+
+def _dumps_indented(data: Any) -> str:
+    """Serializa con sangría de 2 espacios sin escapar caracteres no ASCII (el formato de los prompts)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
 class AgentsManager:
     """Gestor principal que coordina todos los agentes inteligentes."""
     
+    # Estudiantes evaluados a la vez; cada evaluación es casi todo espera de red
+    # (GitHub + LLM), así que el límite lo ponen las cuotas de los proveedores
+    MAX_STUDENT_WORKERS = 5
+    
+    # Cambiarla invalida los resultados cacheados de versiones anteriores
+    AGENTE_VERSION = "1.0.0"
+    
+    # Vigencia de una evaluación cacheada (segundos), aunque el commit no cambie
+    RESULTS_CACHE_TTL = 24 * 3600
+    
     def __init__(self):
         """Inicializa el gestor y todos los agentes."""
         self.analysis_agent = AnalysisAgent()
         self.recommendation_agent = RecommendationAgent()
         self.monitoring_agent = MonitoringAgent()
         self.evaluator = None
+        self.session = None
+        self.rubrica = None
+        self.rubrica_key = None
         
         # Directorio de resultados
         self.results_dir = Path("evaluaciones_agentes")
         self.results_dir.mkdir(exist_ok=True)
         
+        # Resultados completos por commit: re-evaluar un repositorio sin cambios es inmediato
+        self.results_cache = PromptCache(path=os.path.join(Config.CACHE_DIRECTORY, "resultados.sqlite"))
+        
+        # Escrituras de resultados en segundo plano durante la evaluación de una clase
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._pending_writes = []
+        self._pending_lock = threading.Lock()
+        
     def initialize_evaluator(self):
         """Inicializa el evaluador principal."""
         if not Config.validate_config():
             raise ValueError("Configuración incompleta. Verifica tu archivo .env")
         
+        # Una sola sesión con pool para todos los estudiantes (y los hilos que los evalúan)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=50,
+                              max_retries=Retry(total=3, backoff_factor=0.3))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         self.evaluator = RubricaEvaluator(
             github_token=Config.GITHUB_TOKEN,
             llm_provider=Config.LLM_PROVIDER,
-            llm_api_key=Config.LLM_API_KEY
+            llm_api_key=Config.LLM_API_KEY,
+            session=self.session,
+            pool_size=self.MAX_STUDENT_WORKERS * 2
         )
+        
+        # La rúbrica es la misma para todos los estudiantes: se carga y se resume una vez
+        rubrica_dict = create_kedro_rubrica()
+        self.rubrica = self.evaluator.load_rubrica_from_dict(rubrica_dict)
+        self.rubrica_key = PromptCache.make_key(rubrica_dict)
     
-    def evaluate_with_agents(self, repo_url: str, student_info: Optional[Dict] = None) -> Dict[str, Any]:
-        """Evalúa un repositorio y genera insights inteligentes."""
+    def flush(self):
+        """Espera a que terminen las escrituras de resultados en segundo plano."""
+        with self._pending_lock:
+            pending, self._pending_writes = self._pending_writes, []
+        
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"❌ Error guardando resultados: {e}")
+    
+    def close(self):
+        """Termina las escrituras pendientes y cierra las conexiones HTTP abiertas por el evaluador."""
+        self.flush()
+        self._io_pool.shutdown(wait=True)
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def evaluate_with_agents(self, repo_url: str, student_info: Optional[Dict] = None,
+                             force: bool = False, background_io: bool = False,
+                             write_html: bool = True) -> Dict[str, Any]:
+        """Evalúa un repositorio y genera insights inteligentes.
+        
+        Si el repositorio no cambió desde una evaluación anterior con la misma
+        rúbrica y modelos, se devuelven esos resultados (con su fecha original)
+        y sus archivos se vuelven a escribir con esa misma fecha; force=True la repite.
+        Con background_io=True los archivos se escriben en segundo plano y hay
+        que llamar a flush() antes de leerlos; write_html=False omite el reporte HTML.
+        """
         
         if not self.evaluator:
             self.initialize_evaluator()
         
-        print(f"🚀 Evaluando con agentes inteligentes: {repo_url}")
+        cache_key = self._results_cache_key(repo_url, student_info)
+        if cache_key and not force:
+            cached = self.results_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"♻️ Repositorio sin cambios, usando evaluación guardada: {repo_url}")
+                results = json.loads(cached)
+                evaluated_at = datetime.fromisoformat(results["timestamp"])
+                self._save_results(results, repo_url, evaluated_at, wait=not background_io, write_html=write_html)
+                return results
+        
+        logger.info(f"🚀 Evaluando con agentes inteligentes: {repo_url}")
         
         # 1. Evaluación básica
-        print("📊 Realizando evaluación básica...")
-        rubrica_dict = create_kedro_rubrica()
-        rubrica = self.evaluator.load_rubrica_from_dict(rubrica_dict)
-        evaluation = self.evaluator.evaluate_repository(repo_url, rubrica)
+        logger.info("📊 Realizando evaluación básica...")
+        evaluation = self.evaluator.evaluate_repository(repo_url, self.rubrica)
         
-        # 2. Análisis inteligente
-        print("🔍 Generando análisis inteligente...")
+        # 2-4. Análisis, recomendaciones y alertas: son independientes entre sí,
+        # así que se lanzan a la vez y el tiempo es el del agente más lento
+        logger.info("🔍 Generando análisis, recomendaciones y alertas...")
         evaluation_dict = self._convert_evaluation_to_dict(evaluation)
-        insights = self.analysis_agent.generate_improvement_recommendations(evaluation_dict)
-        
-        # 3. Recomendaciones personalizadas
-        print("💡 Creando recomendaciones personalizadas...")
-        recommendations = self.recommendation_agent.generate_personalized_recommendations(
-            evaluation_dict, student_info
-        )
-        
-        # 4. Monitoreo y alertas
-        print("🚨 Generando alertas de monitoreo...")
-        alerts = self.monitoring_agent.generate_alerts([evaluation_dict])
+        prompt_evaluation = _prompt_view(evaluation_dict)
+        # Serializada una sola vez para los dos agentes que la incluyen en su prompt
+        evaluation_json = _dumps_indented(prompt_evaluation)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            insights_future = executor.submit(
+                self.analysis_agent.generate_improvement_recommendations, prompt_evaluation, evaluation_json
+            )
+            recommendations_future = executor.submit(
+                self.recommendation_agent.generate_personalized_recommendations,
+                prompt_evaluation, student_info, evaluation_json
+            )
+            alerts_future = executor.submit(self.monitoring_agent.generate_alerts, [evaluation_dict])
+        insights = insights_future.result()
+        recommendations = recommendations_future.result()
+        alerts = alerts_future.result()
+        
+        # Un solo instante para el JSON, los nombres de archivo y el reporte
+        now = datetime.now()
         
         # Compilar resultados
         results = {
             "evaluacion_basica": evaluation_dict,
-            "insights": [insight.__dict__ for insight in insights],
-            "recomendaciones": [rec.__dict__ for rec in recommendations],
-            "alertas": [alert.__dict__ for alert in alerts],
-            "timestamp": datetime.now().isoformat(),
-            "agente_version": "1.0.0"
+            "insights": [asdict(insight) for insight in insights],
+            "recomendaciones": [asdict(rec) for rec in recommendations],
+            "alertas": [asdict(alert) for alert in alerts],
+            "timestamp": now.isoformat(),
+            "agente_version": self.AGENTE_VERSION
         }
         
         # Guardar resultados
-        self._save_results(results, repo_url)
+        self._save_results(results, repo_url, now, wait=not background_io, write_html=write_html)
+        if cache_key and self._is_cacheable(results):
+            self.results_cache.set(
+                cache_key, json.dumps(results, ensure_ascii=False, default=str), ttl=self.RESULTS_CACHE_TTL
+            )
         
         return results
     
-    def evaluate_class_with_agents(self, students_data: List[Dict]) -> Dict[str, Any]:
-        """Evalúa una clase completa con análisis inteligente."""
+    def evaluate_class_with_agents(self, students_data: List[Dict],
+                                   generate_individual_html: bool = False) -> Dict[str, Any]:
+        """Evalúa una clase completa con análisis inteligente.
+        
+        Por defecto solo se guarda el JSON de cada estudiante (el reporte de clase
+        se genera igual); generate_individual_html=True agrega su reporte HTML.
+        """
         
         if not self.evaluator:
             self.initialize_evaluator()
         
-        print(f"🎓 Evaluando clase completa: {len(students_data)} estudiantes")
-        
-        all_evaluations = []
-        all_results = []
-        
-        for i, student_data in enumerate(students_data, 1):
-            print(f"\n{'='*60}")
-            print(f"📊 EVALUANDO {i}/{len(students_data)}: {student_data.get('nombre', 'Estudiante')}")
-            print(f"{'='*60}")
-            
-            try:
-                # Evaluar con agentes
-                results = self.evaluate_with_agents(
-                    student_data['repo_url'], 
-                    student_data
-                )
-                
-                all_results.append(results)
-                all_evaluations.append(results['evaluacion_basica'])
-                
-                print(f"✅ Completado - Nota: {results['evaluacion_basica']['nota_final']}/7.0")
-                
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                continue
+        logger.info(f"🎓 Evaluando clase completa: {len(students_data)} estudiantes")
+        
+        # Los resultados se guardan por posición para conservar el orden de la lista
+        total = len(students_data)
+        ordered_results = [None] * total
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.MAX_STUDENT_WORKERS, total))) as executor:
+            futures = {
+                executor.submit(self._evaluate_student, student_data, generate_individual_html): i
+                for i, student_data in enumerate(students_data)
+            }
+            # Un solo print por estudiante terminado para no mezclar líneas entre hilos
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                nombre = students_data[i].get('nombre', 'Estudiante')
+                results, error = future.result()
+                if error is not None:
+                    logger.error(f"❌ [{done}/{total}] {nombre}: Error: {error}")
+                    continue
+                ordered_results[i] = results
+                logger.info(f"✅ [{done}/{total}] {nombre} - Nota: {results['evaluacion_basica']['nota_final']}/7.0")
+        
+        self.flush()
+        
+        all_results = [results for results in ordered_results if results is not None]
+        all_evaluations = [results['evaluacion_basica'] for results in all_results]
         
         # Análisis de clase completo
-        print(f"\n🧠 Generando análisis inteligente de clase...")
+        logger.info("\n🧠 Generando análisis inteligente de clase...")
         
         # Tendencias generales
         trends = self.analysis_agent.analyze_evaluation_trends(all_evaluations)
@@ -132,29 +294,73 @@ class AgentsManager:
         # Alertas de monitoreo
         class_alerts = self.monitoring_agent.generate_alerts(all_evaluations)
         
+        # Notas leídas una sola vez; con la clase vacía (todos fallaron) el resumen queda en 0
+        notas = [e.get('nota_final', 0) for e in all_evaluations]
+        n = len(notas)
+        
+        now = datetime.now()
+        
         # Compilar resultados de clase
         class_results = {
             "resumen_clase": {
-                "total_estudiantes": len(all_evaluations),
-                "nota_promedio": sum(e.get('nota_final', 0) for e in all_evaluations) / len(all_evaluations),
-                "nota_maxima": max(e.get('nota_final', 0) for e in all_evaluations),
-                "nota_minima": min(e.get('nota_final', 0) for e in all_evaluations)
+                "total_estudiantes": n,
+                "nota_promedio": sum(notas) / n if n else 0,
+                "nota_maxima": max(notas) if n else 0,
+                "nota_minima": min(notas) if n else 0
             },
             "evaluaciones_individuales": all_results,
-            "tendencias_clase": [trend.__dict__ for trend in trends],
-            "problemas_comunes": [issue.__dict__ for issue in issues],
-            "alertas_clase": [alert.__dict__ for alert in class_alerts],
-            "timestamp": datetime.now().isoformat()
+            "tendencias_clase": [asdict(trend) for trend in trends],
+            "problemas_comunes": [asdict(issue) for issue in issues],
+            "alertas_clase": [asdict(alert) for alert in class_alerts],
+            "timestamp": now.isoformat()
         }
         
         # Guardar resultados de clase
-        self._save_class_results(class_results)
+        self._save_class_results(class_results, now)
         
         # Generar reportes
-        self._generate_class_reports(class_results)
+        self._generate_class_reports(class_results, now)
         
         return class_results
     
+    def _results_cache_key(self, repo_url: str, student_info: Optional[Dict]) -> Optional[str]:
+        """Clave de los resultados cacheados, o None si no se pudo obtener el commit actual."""
+        if not self.results_cache.enabled:
+            return None
+        
+        commit_sha = self.evaluator.github_analyzer.get_head_sha(repo_url)
+        if commit_sha is None:
+            return None
+        
+        # student_info entra en la clave porque cambia las recomendaciones
+        return PromptCache.make_key(
+            repo_url, commit_sha, self.rubrica_key, student_info, Config.LLM_PROVIDER,
+            self.analysis_agent.model, self.recommendation_agent.model, self.monitoring_agent.model,
+            self.AGENTE_VERSION
+        )
+    
+    @staticmethod
+    def _is_cacheable(results: Dict[str, Any]) -> bool:
+        """Solo se cachean evaluaciones completas: sin criterios con error y con respuesta de los agentes LLM.
+        
+        El evaluador devuelve nota 1.0 con "Error en evaluación" y los agentes
+        devuelven listas vacías cuando falla el proveedor (429, timeout, Ollama caído).
+        """
+        criterios = results["evaluacion_basica"].get("criterios", [])
+        if any(str(c.get("retroalimentacion", "")).startswith("Error en evaluación") for c in criterios):
+            return False
+        return bool(results["insights"]) and bool(results["recomendaciones"])
+    
+    def _evaluate_student(self, student_data: Dict, write_html: bool):
+        """Evalúa un estudiante; devuelve (resultados, None) o (None, error) sin propagar excepciones."""
+        try:
+            results = self.evaluate_with_agents(
+                student_data['repo_url'], student_data, background_io=True, write_html=write_html
+            )
+            return results, None
+        except Exception as e:
+            return None, e
+    
     def _convert_evaluation_to_dict(self, evaluation) -> Dict[str, Any]:
         """Convierte una evaluación a diccionario serializable."""
         return {
@@ -176,218 +382,96 @@ class AgentsManager:
             "tiempo_evaluacion": evaluation.tiempo_evaluacion
         }
     
-    def _save_results(self, results: Dict, repo_url: str):
-        """Guarda los resultados de una evaluación individual."""
+    def _save_results(self, results: Dict, repo_url: str, now: datetime, wait: bool = True, write_html: bool = True):
+        """Guarda los resultados de una evaluación individual.
         
-        repo_name = repo_url.split('/')[-1]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        Con wait=False las escrituras quedan en cola (ver flush) y el hilo que
+        evalúa puede seguir con el siguiente estudiante.
+        """
         
-        # Guardar JSON completo
+        # Con microsegundos: dos estudiantes de la misma pareja (mismo repositorio)
+        # pueden terminar en el mismo segundo al evaluarse en paralelo
+        repo_name = _repo_slug(repo_url)
+        timestamp = now.strftime("%Y%m%d_%H%M%S_%f")
         json_path = self.results_dir / f"{repo_name}_agentes_{timestamp}.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+        html_path = self.results_dir / f"{repo_name}_reporte_agentes_{timestamp}.html"
+        paths = [json_path, html_path] if write_html else [json_path]
+        
+        if not wait:
+            futures = [self._io_pool.submit(_write_json, json_path, results)]
+            if write_html:
+                futures.append(self._io_pool.submit(self._generate_individual_report, results, html_path, now))
+            with self._pending_lock:
+                self._pending_writes.extend(futures)
+            logger.info(f"📁 Guardando resultados en {', '.join(path.name for path in paths)}")
+            return
+        
+        # Guardar JSON completo
+        _write_json(json_path, results)
         
         # Generar reporte HTML
-        html_path = self.results_dir / f"{repo_name}_reporte_agentes_{timestamp}.html"
-        self._generate_individual_report(results, html_path)
+        if write_html:
+            self._generate_individual_report(results, html_path, now)
         
-        print(f"📁 Resultados guardados:")
-        print(f"   - JSON: {json_path}")
-        print(f"   - HTML: {html_path}")
+        logger.info("📁 Resultados guardados:" + "".join(
+            f"\n   - {path.suffix[1:].upper()}: {path}" for path in paths
+        ))
+    
+    def generate_individual_reports(self) -> List[Path]:
+        """Genera los reportes HTML individuales que falten a partir de los JSON guardados."""
+        generated = []
+        for json_path in sorted(self.results_dir.glob("*_agentes_*.json")):
+            if json_path.name.startswith("clase_agentes_"):
+                continue
+            
+            repo_name, timestamp = json_path.stem.rsplit("_agentes_", 1)
+            html_path = self.results_dir / f"{repo_name}_reporte_agentes_{timestamp}.html"
+            if html_path.exists():
+                continue
+            
+            with open(json_path, encoding='utf-8') as f:
+                results = json.load(f)
+            # La fecha del reporte es la de la evaluación guardada
+            self._generate_individual_report(results, html_path, datetime.fromisoformat(results['timestamp']))
+            generated.append(html_path)
+        
+        logger.info(f"📊 Reportes individuales generados: {len(generated)}")
+        return generated
     
-    def _save_class_results(self, results: Dict):
+    def _save_class_results(self, results: Dict, now: datetime):
         """Guarda los resultados de evaluación de clase."""
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         
         # Guardar JSON completo
         json_path = self.results_dir / f"clase_agentes_{timestamp}.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+        _write_json(json_path, results)
         
-        print(f"📁 Resultados de clase guardados: {json_path}")
+        logger.info(f"📁 Resultados de clase guardados: {json_path}")
     
-    def _generate_individual_report(self, results: Dict, output_path: Path):
+    def _generate_individual_report(self, results: Dict, output_path: Path, now: datetime):
         """Genera reporte HTML para evaluación individual."""
         
-        evaluation = results['evaluacion_basica']
-        
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Evaluación Inteligente - {evaluation.get('repositorio', 'Proyecto')}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }}
-        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px; margin-bottom: 20px; }}
-        .section {{ margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; }}
-        .insight {{ background-color: #f8f9fa; padding: 10px; margin: 10px 0; border-left: 4px solid #007bff; }}
-        .recommendation {{ background-color: #fff3cd; padding: 10px; margin: 10px 0; border-left: 4px solid #ffc107; }}
-        .alert {{ background-color: #f8d7da; padding: 10px; margin: 10px 0; border-left: 4px solid #dc3545; }}
-        .nota {{ font-size: 2em; font-weight: bold; color: #28a745; }}
-        .criterio {{ margin: 10px 0; padding: 10px; background-color: #f8f9fa; }}
-        .timestamp {{ color: #6c757d; font-size: 0.9em; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🤖 Evaluación Inteligente con Agentes IA</h1>
-        <p><strong>Repositorio:</strong> {evaluation.get('repositorio', 'N/A')}</p>
-        <p><strong>Fecha:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-        <div class="nota">Nota Final: {evaluation.get('nota_final', 0):.2f}/7.0</div>
-    </div>
-    
-    <div class="section">
-        <h2>📊 Evaluación por Criterios</h2>
-"""
-        
-        for criterio in evaluation.get('criterios', []):
-            html_content += f"""
-        <div class="criterio">
-            <h3>{criterio.get('criterio', 'N/A')}</h3>
-            <p><strong>Puntuación:</strong> {criterio.get('puntuacion', 0)}%</p>
-            <p><strong>Nota:</strong> {criterio.get('nota', 0):.2f}/7.0</p>
-            <p><strong>Retroalimentación:</strong> {criterio.get('retroalimentacion', 'N/A')}</p>
-        </div>
-"""
-        
-        # Insights
-        if results.get('insights'):
-            html_content += """
-    </div>
-    
-    <div class="section">
-        <h2>🔍 Insights Inteligentes</h2>
-"""
-            for insight in results['insights']:
-                html_content += f"""
-        <div class="insight">
-            <h3>{insight.get('titulo', 'N/A')}</h3>
-            <p>{insight.get('descripcion', 'N/A')}</p>
-            <p><strong>Criterios afectados:</strong> {', '.join(insight.get('criterios_afectados', []))}</p>
-        </div>
-"""
-        
-        # Recomendaciones
-        if results.get('recomendaciones'):
-            html_content += """
-    </div>
+        _TEMPLATES.get_template("individual.html.j2").stream(
+            evaluation=results['evaluacion_basica'],
+            results=results,
+            fecha=now.strftime('%d/%m/%Y %H:%M')
+        ).dump(str(output_path), encoding='utf-8')
     
-    <div class="section">
-        <h2>💡 Recomendaciones Personalizadas</h2>
-"""
-            for rec in results['recomendaciones']:
-                html_content += f"""
-        <div class="recommendation">
-            <h3>{rec.get('titulo', 'N/A')}</h3>
-            <p>{rec.get('descripcion', 'N/A')}</p>
-            <p><strong>Prioridad:</strong> {rec.get('prioridad', 'N/A')}</p>
-            <p><strong>Tiempo estimado:</strong> {rec.get('tiempo_estimado', 'N/A')}</p>
-        </div>
-"""
-        
-        html_content += """
-    </div>
-    
-    <div class="timestamp">
-        Reporte generado automáticamente por Agentes Inteligentes
-    </div>
-</body>
-</html>
-"""
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-    
-    def _generate_class_reports(self, results: Dict):
+    def _generate_class_reports(self, results: Dict, now: datetime):
         """Genera reportes para la evaluación de clase."""
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         
         # Reporte HTML de clase
         html_path = self.results_dir / f"clase_report_agentes_{timestamp}.html"
         
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Reporte de Clase - Agentes Inteligentes</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; }}
-        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px; margin-bottom: 20px; }}
-        .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
-        .stat-box {{ background: #f8f9fa; padding: 20px; border-radius: 10px; text-align: center; }}
-        .section {{ margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; }}
-        .alert {{ background-color: #f8d7da; padding: 10px; margin: 10px 0; border-left: 4px solid #dc3545; }}
-        .trend {{ background-color: #d4edda; padding: 10px; margin: 10px 0; border-left: 4px solid #28a745; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🎓 Reporte de Clase - Agentes Inteligentes</h1>
-        <p><strong>Fecha:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-    </div>
-    
-    <div class="stats">
-        <div class="stat-box">
-            <h2>{results['resumen_clase']['total_estudiantes']}</h2>
-            <p>Estudiantes Evaluados</p>
-        </div>
-        <div class="stat-box">
-            <h2>{results['resumen_clase']['nota_promedio']:.2f}</h2>
-            <p>Nota Promedio</p>
-        </div>
-        <div class="stat-box">
-            <h2>{results['resumen_clase']['nota_maxima']:.2f}</h2>
-            <p>Nota Máxima</p>
-        </div>
-        <div class="stat-box">
-            <h2>{results['resumen_clase']['nota_minima']:.2f}</h2>
-            <p>Nota Mínima</p>
-        </div>
-    </div>
-"""
-        
-        # Alertas críticas
-        if results.get('alertas_clase'):
-            critical_alerts = [a for a in results['alertas_clase'] if a.get('severidad') == 'critica']
-            if critical_alerts:
-                html_content += """
-    <div class="section">
-        <h2>🚨 Alertas Críticas</h2>
-"""
-                for alert in critical_alerts:
-                    html_content += f"""
-        <div class="alert">
-            <h3>{alert.get('titulo', 'N/A')}</h3>
-            <p><strong>Estudiante:</strong> {alert.get('estudiante', 'N/A')}</p>
-            <p>{alert.get('descripcion', 'N/A')}</p>
-        </div>
-"""
-        
-        # Tendencias
-        if results.get('tendencias_clase'):
-            html_content += """
-    </div>
-    
-    <div class="section">
-        <h2>📈 Tendencias Identificadas</h2>
-"""
-            for trend in results['tendencias_clase']:
-                html_content += f"""
-        <div class="trend">
-            <h3>{trend.get('titulo', 'N/A')}</h3>
-            <p>{trend.get('descripcion', 'N/A')}</p>
-        </div>
-"""
-        
-        html_content += """
-    </div>
-</body>
-</html>
-"""
-        
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        critical_alerts = [a for a in results.get('alertas_clase') or [] if a.get('severidad') == 'critica']
+        _TEMPLATES.get_template("class.html.j2").stream(
+            results=results,
+            resumen=results['resumen_clase'],
+            critical_alerts=critical_alerts,
+            fecha=now.strftime('%d/%m/%Y %H:%M')
+        ).dump(str(html_path), encoding='utf-8')
         
-        print(f"📊 Reporte de clase generado: {html_path}")
+        logger.info(f"📊 Reporte de clase generado: {html_path}")
@@ -36,9 +36,25 @@ class Config:
     DEFAULT_OUTPUT_DIR = "./evaluaciones"
     DEFAULT_TIMEOUT = 300  # 5 minutos
     
+    # Caché de respuestas LLM (local al proyecto, como DEFAULT_OUTPUT_DIR)
+    USE_CACHE = os.getenv("USE_CACHE", "true").lower() == "true"
+    CACHE_DIRECTORY = os.getenv("CACHE_DIRECTORY", "./.cache")
+    
+    # Resultado de validate_config: una configuración válida no se vuelve a comprobar
+    _validated = None
+    # Sesión HTTP para el chequeo de Ollama (reutiliza la conexión si se repite)
+    _session = None
+    
     @classmethod
     def validate_config(cls):
-        """Valida que la configuración esté completa."""
+        """Valida que la configuración esté completa.
+        
+        Solo se memoriza el éxito: si falla (p. ej. Ollama apagado) la siguiente
+        llamada vuelve a comprobar, por si el problema ya se corrigió.
+        """
+        if cls._validated:
+            return True
+        
         missing = []
         
         if not cls.GITHUB_TOKEN:
@@ -49,8 +65,10 @@ class Config:
         # Validar que Ollama esté funcionando si es el proveedor seleccionado
         if cls.LLM_PROVIDER == "ollama":
             import requests
+            if cls._session is None:
+                cls._session = requests.Session()
             try:
-                response = requests.get(f"{cls.LLM_PROVIDERS['ollama']['base_url']}/api/tags", timeout=5)
+                response = cls._session.get(f"{cls.LLM_PROVIDERS['ollama']['base_url']}/api/tags", timeout=5)
                 if response.status_code == 200:
                     print("✅ Ollama está funcionando correctamente")
                 else:
@@ -72,4 +90,5 @@ class Config:
             return False
         
         print("✅ Configuración válida")
+        cls._validated = True
         return True
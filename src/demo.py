@@ -15,6 +15,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__)))
 from agents_manager import AgentsManager
 from agents import AnalysisAgent, RecommendationAgent, MonitoringAgent
 
+# Pausas visuales solo en presentaciones en vivo: DEMO_ANIMATE=1 python demo.py
+ANIMATE = os.environ.get("DEMO_ANIMATE") == "1"
+
 def print_banner():
     """Muestra banner de bienvenida."""
     print("=" * 70)
@@ -163,7 +166,8 @@ def show_capabilities():
     
     for capability in capabilities:
         print(f"   {capability}")
-        time.sleep(0.1)  # Efecto visual
+        if ANIMATE:
+            time.sleep(0.1)  # Efecto visual
 
 def main():
     """Función principal del demo."""
@@ -192,7 +196,8 @@ def main():
         
         if i < len(demos):
             print(f"\n⏸️  Continuando al siguiente demo...")
-            time.sleep(2)  # Pausa de 2 segundos
+            if ANIMATE:
+                time.sleep(2)  # Pausa de 2 segundos
     
     print(f"\n🎉 DEMO COMPLETADO")
     print("=" * 50)
@@ -5,17 +5,29 @@ Evaluación Parcial 1 - Proyecto Práctico (70% de la nota)
 """
 
 import os
+import re
 import json
+import base64
+import bisect
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
+from types import SimpleNamespace
 import yaml
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 from github import Github, GithubException
 from examples.rubrica_kedro import create_kedro_ml_rubrica, OLLAMA_CONFIG
+from agents.prompt_cache import PromptCache
+from config import Config
 
 # Configurar logging
 logging.basicConfig(
@@ -28,6 +40,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Subdirectorios de src/<paquete>/pipelines/ presentes en el árbol del repo
+_PIPELINE_RE = re.compile(r'^src/[^/]+/pipelines/([^/]+)/')
+
+# Líneas de catalog.yml que se reconocen sin parsear el YAML completo
+_CATALOG_KEY_RE = re.compile(r'^([A-Za-z_][\w.\-]*)[ \t]*:(?:[ \t]+&([\w\-]+))?(?:[ \t]+#.*)?[ \t]*$')
+_CATALOG_ENTRY_RE = re.compile(r'^(<<|[A-Za-z_][\w.\-]*)[ \t]*:(?:[ \t]+(.*))?$')
+_QUOTED_SCALAR_RE = re.compile(r'^(?:\'[^\']*\'|"[^"\\]*")$')
+_COMMENT_RE = re.compile(r'[ \t]#')
+_MAPPING_IN_SCALAR_RE = re.compile(r':(?:[ \t]|$)')
+# Caracteres que no pueden iniciar un escalar simple en YAML
+_YAML_INDICATORS = frozenset("-?:,[]{}#&*!|>'\"%@`")
+_YAML_RESOLVER = yaml.resolver.Resolver()
+_YAML_STR_TAG = 'tag:yaml.org,2002:str'
+
+
+def _valor_simple(valor: str) -> bool:
+    """Indica si el valor es un escalar que el YAML leería sin error."""
+    if _QUOTED_SCALAR_RE.match(valor):
+        return True
+    return valor[0] not in _YAML_INDICATORS and not _MAPPING_IN_SCALAR_RE.search(valor)
+
+# La rúbrica es estática: se construye una vez y se comparte (solo lectura)
+_RUBRICA_KEDRO = create_kedro_ml_rubrica()
+
+# Tipo de evaluación según el nombre del criterio (la primera coincidencia gana)
+_TIPOS_CRITERIO = (
+    ("Estructura y Configuración", "estructura"),
+    ("Catálogo de Datos", "catalogo"),
+    ("Pipelines", "pipelines"),
+    ("Documentación", "documentacion"),
+    ("Reproducibilidad", "reproducibilidad"),
+)
+
+# Escala chilena: nota para cada umbral mínimo de porcentaje
+_THRESHOLDS = (0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+_NOTAS = (1.0, 2.0, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0)
+
+
+def _porcentaje_a_nota(porcentaje: float) -> float:
+    """Convierte un porcentaje a nota en escala chilena (1.0 - 7.0)."""
+    return _NOTAS[max(0, bisect.bisect_right(_THRESHOLDS, porcentaje) - 1)]
+
+
+def _tipo_criterio(nombre: str) -> str:
+    """Clasifica un criterio por su nombre; 'generico' si no hay coincidencia."""
+    for fragmento, tipo in _TIPOS_CRITERIO:
+        if fragmento in nombre:
+            return tipo
+    return "generico"
+
 
 @dataclass
 class EvaluacionKedro:
@@ -56,7 +118,6 @@ class EvaluacionKedro:
     
     # Metadatos
     tiempo_evaluacion: float
-    version_evaluador: str = "1.0.0"
     
     # Retroalimentación
     resumen_general: str
@@ -64,6 +125,8 @@ class EvaluacionKedro:
     areas_mejora: List[str]
     recomendaciones: List[str]
     
+    version_evaluador: str = "1.0.0"
+    
     def to_dict(self) -> Dict:
         """Convierte la evaluación a diccionario."""
         data = asdict(self)
@@ -72,38 +135,104 @@ class EvaluacionKedro:
     
     def calcular_nota_escala_chilena(self) -> float:
         """Convierte el porcentaje a nota en escala chilena (1.0 - 7.0)."""
-        escala = {
-            100: 7.0, 90: 6.5, 80: 6.0, 70: 5.5,
-            60: 5.0, 50: 4.5, 40: 4.0, 30: 3.5,
-            20: 3.0, 10: 2.0, 0: 1.0
-        }
-        
-        # Encontrar la nota correspondiente
-        for porcentaje, nota in sorted(escala.items(), reverse=True):
-            if self.porcentaje_total >= porcentaje:
-                return nota
-        return 1.0
+        return _porcentaje_a_nota(self.porcentaje_total)
+
+
+class _CachedRepo:
+    """
+    Envoltorio de un Repository de PyGithub que guarda en disco el árbol
+    y los archivos descargados, indexados por el commit actual de la rama
+    principal. Un nuevo push cambia el commit e invalida las entradas.
+    """
+    
+    def __init__(self, repo, cache: PromptCache):
+        """Resuelve el commit actual de la rama principal."""
+        self._repo = repo
+        self._cache = cache
+        self.sha = repo.get_branch(repo.default_branch).commit.sha
+    
+    def __getattr__(self, name):
+        """Delega el resto de atributos al repositorio original."""
+        return getattr(self._repo, name)
+    
+    def _key(self, *parts) -> str:
+        """Clave de caché para (repositorio, commit, recurso)."""
+        return PromptCache.make_key(self._repo.full_name, self.sha, *parts)
+    
+    def get_git_tree(self, ref, recursive=False):
+        """Árbol del commit actual; ``ref`` se resuelve siempre a ``self.sha``."""
+        key = self._key("tree", recursive)
+        cached = self._cache.get(key)
+        if cached is not None:
+            paths = json.loads(cached)
+        else:
+            tree = self._repo.get_git_tree(self.sha, recursive=recursive)
+            paths = [entry.path for entry in tree.tree]
+            self._cache.set(key, json.dumps(paths))
+        return SimpleNamespace(tree=[SimpleNamespace(path=p) for p in paths])
+    
+    def get_contents(self, path, ref=None):
+        """Contenido de un archivo del commit actual."""
+        key = self._key("blob", path)
+        cached = self._cache.get(key)
+        if cached is None:
+            contenido = self._repo.get_contents(path, ref=self.sha)
+            if isinstance(contenido, list):
+                return contenido
+            cached = contenido.content or ""
+            self._cache.set(key, cached)
+        return SimpleNamespace(path=path, content=cached, decoded_content=base64.b64decode(cached))
 
 
 class KedroProjectAnalyzer:
     """Analizador específico para proyectos Kedro."""
     
-    def __init__(self, github_token: str, ollama_client=None):
+    # Descargas simultáneas de archivos Python
+    MAX_FETCH_WORKERS = 10
+    
+    # Directorios que no se analizan
+    DIRECTORIOS_IGNORADOS = {'.git', '__pycache__', '.venv', 'venv'}
+    
+    def __init__(self, github_token: str, ollama_client=None, cache: Optional[PromptCache] = None):
         """
         Inicializa el analizador.
         
         Args:
             github_token: Token de acceso a GitHub
             ollama_client: Cliente de Ollama para análisis con IA
+            cache: Caché de respuestas de GitHub (por defecto en CACHE_DIRECTORY)
         """
         self.github = Github(github_token)
         self.ollama_client = ollama_client
-        self.rubrica = create_kedro_ml_rubrica()
+        self.rubrica = _RUBRICA_KEDRO
+        self.cache = cache or PromptCache(path=Path(Config.CACHE_DIRECTORY) / "github.sqlite")
+    
+    def abrir_repo(self, repo):
+        """Envuelve el repositorio con la caché en disco si está habilitada."""
+        return _CachedRepo(repo, self.cache) if self.cache.enabled else repo
+    
+    def listar_rutas(self, repo) -> Set[str]:
+        """
+        Obtiene todas las rutas del repositorio con una sola llamada al árbol git.
+        
+        Returns:
+            Conjunto con las rutas de archivos y directorios
+        """
+        try:
+            tree = repo.get_git_tree(repo.default_branch, recursive=True)
+            return {entry.path for entry in tree.tree}
+        except GithubException as e:
+            logger.error(f"Error obteniendo árbol del repositorio: {e}")
+            return set()
         
-    def analizar_estructura_kedro(self, repo) -> Dict[str, Any]:
+    def analizar_estructura_kedro(self, repo, rutas: Optional[Set[str]] = None) -> Dict[str, Any]:
         """
         Analiza la estructura específica de un proyecto Kedro.
         
+        Args:
+            repo: Repositorio de GitHub
+            rutas: Rutas del repositorio (se obtienen si no se entregan)
+        
         Returns:
             Diccionario con el análisis de la estructura
         """
@@ -118,13 +247,15 @@ class KedroProjectAnalyzer:
         }
         
         try:
+            if rutas is None:
+                rutas = self.listar_rutas(repo)
+            
             # Verificar directorios principales de Kedro
             directorios_requeridos = ['conf', 'data', 'src', 'notebooks']
             for dir_name in directorios_requeridos:
-                try:
-                    repo.get_contents(dir_name)
+                if dir_name in rutas:
                     estructura["directorios_principales"].append(dir_name)
-                except:
+                else:
                     estructura["errores"].append(f"Falta directorio: {dir_name}")
             
             # Verificar archivos de configuración
@@ -136,31 +267,24 @@ class KedroProjectAnalyzer:
             ]
             
             for archivo in archivos_config:
-                try:
-                    contenido = repo.get_contents(archivo)
-                    estructura["archivos_configuracion"].append(archivo)
-                    
-                    # Analizar catalog.yml para contar datasets
-                    if archivo == 'conf/base/catalog.yml':
-                        catalog_content = contenido.decoded_content.decode()
-                        estructura["datasets_configurados"] = self._contar_datasets(catalog_content)
-                except:
+                if archivo not in rutas:
                     estructura["errores"].append(f"Falta archivo: {archivo}")
+                    continue
+                estructura["archivos_configuracion"].append(archivo)
+                
+                # Solo se descarga catalog.yml, para contar datasets
+                if archivo == 'conf/base/catalog.yml':
+                    try:
+                        catalog_content = repo.get_contents(archivo).decoded_content.decode()
+                        estructura["datasets_configurados"] = self._contar_datasets(catalog_content)
+                    except Exception as e:
+                        estructura["errores"].append(f"No se pudo leer {archivo}: {e}")
             
             # Buscar pipelines
-            try:
-                src_contents = repo.get_contents("src")
-                for item in src_contents:
-                    if item.type == "dir":
-                        pipelines_path = f"src/{item.name}/pipelines"
-                        try:
-                            pipelines = repo.get_contents(pipelines_path)
-                            for pipeline in pipelines:
-                                if pipeline.type == "dir":
-                                    estructura["pipelines_encontrados"].append(pipeline.name)
-                        except:
-                            pass
-            except:
+            if "src" in rutas:
+                pipelines = {m.group(1) for m in map(_PIPELINE_RE.match, rutas) if m}
+                estructura["pipelines_encontrados"] = sorted(pipelines)
+            else:
                 estructura["errores"].append("No se pudo acceder a src/pipelines")
             
             # Verificar notebooks CRISP-DM
@@ -170,15 +294,18 @@ class KedroProjectAnalyzer:
                 '03_data_preparation'
             ]
             
-            try:
-                notebooks = repo.get_contents("notebooks")
-                for notebook in notebooks:
-                    if notebook.name.endswith('.ipynb'):
+            if "notebooks" in rutas:
+                nombres = sorted(
+                    ruta[len("notebooks/"):] for ruta in rutas
+                    if ruta.startswith("notebooks/") and ruta.count("/") == 1
+                )
+                for nombre in nombres:
+                    if nombre.endswith('.ipynb'):
                         for fase in notebooks_esperados:
-                            if fase in notebook.name.lower():
-                                estructura["notebooks_crisp_dm"].append(notebook.name)
+                            if fase in nombre.lower():
+                                estructura["notebooks_crisp_dm"].append(nombre)
                                 break
-            except:
+            else:
                 estructura["errores"].append("No se encontraron notebooks")
             
             # Determinar si tiene estructura Kedro válida
@@ -195,8 +322,12 @@ class KedroProjectAnalyzer:
     
     def _contar_datasets(self, catalog_content: str) -> int:
         """Cuenta el número de datasets en el catálogo."""
+        rapido = self._contar_datasets_rapido(catalog_content)
+        if rapido is not None:
+            return rapido
+        
         try:
-            catalog = yaml.safe_load(catalog_content)
+            catalog = yaml.load(catalog_content, Loader=_SafeLoader)
             if catalog:
                 # Filtrar solo datasets válidos (no templates ni versioned)
                 datasets = [k for k in catalog.keys() 
@@ -206,10 +337,93 @@ class KedroProjectAnalyzer:
             pass
         return 0
     
-    def verificar_reproducibilidad(self, repo) -> Dict[str, bool]:
+    @staticmethod
+    def _contar_datasets_rapido(catalog_content: str) -> Optional[int]:
+        """
+        Cuenta los datasets recorriendo las líneas, sin parsear el YAML.
+        
+        Solo reconoce catálogos con claves simples en la columna 0, cada una
+        seguida de un bloque de entradas "clave: valor" con indentación
+        consistente, valores escalares simples y "<<: *ancla" a plantillas ya
+        definidas. Ante cualquier otra forma (incluido YAML inválido o claves
+        que YAML no lee como texto, como "on" o "null") devuelve None para que
+        se use el parser completo.
+        """
+        datasets = set()
+        anclas = set()
+        clave = ancla = None  # Clave de nivel superior cuyo bloque se está leyendo
+        niveles = []  # Indentaciones abiertas dentro del bloque
+        abre = False  # La línea anterior puede abrir un mapeo más indentado
+        
+        for linea in catalog_content.splitlines():
+            contenido = linea.strip()
+            if not contenido or contenido.startswith('#'):
+                continue
+            
+            sangria = len(linea) - len(linea.lstrip(' '))
+            if linea[sangria] == '\t':
+                return None
+            
+            if sangria == 0:
+                # Cierra el bloque anterior: sin entradas su valor sería nulo
+                if clave is not None:
+                    if not niveles:
+                        return None
+                    if not clave.startswith('_'):
+                        datasets.add(clave)
+                    if ancla:
+                        anclas.add(ancla)
+                
+                match = _CATALOG_KEY_RE.match(linea)
+                if not match:
+                    return None
+                clave, ancla = match.groups()
+                if ancla in anclas or _YAML_RESOLVER.resolve(yaml.ScalarNode, clave, (True, False)) != _YAML_STR_TAG:
+                    return None
+                niveles, abre = [], True
+                continue
+            
+            if clave is None:
+                return None
+            
+            if not niveles or sangria > niveles[-1]:
+                if not abre:
+                    return None
+                niveles.append(sangria)
+            else:
+                while niveles and niveles[-1] > sangria:
+                    niveles.pop()
+                if not niveles or niveles[-1] != sangria:
+                    return None
+            
+            match = _CATALOG_ENTRY_RE.match(contenido)
+            if not match:
+                return None
+            nombre, valor = match.group(1), match.group(2) or ''
+            valor = '' if valor.startswith('#') else _COMMENT_RE.split(valor, 1)[0].strip()
+            
+            if nombre == '<<':
+                if not (valor.startswith('*') and valor[1:] in anclas):
+                    return None
+            elif valor and not _valor_simple(valor):
+                return None
+            abre = not valor
+        
+        if clave is not None:
+            if not niveles:
+                return None
+            if not clave.startswith('_'):
+                datasets.add(clave)
+        return len(datasets)
+    
+    def verificar_reproducibilidad(self, repo, rutas: Optional[Set[str]] = None) -> Dict[str, bool]:
         """
         Verifica la reproducibilidad del proyecto.
         
+        Args:
+            repo: Repositorio de GitHub
+            rutas: Rutas del repositorio (se obtienen si no se entregan)
+        
         Returns:
             Diccionario con verificaciones de reproducibilidad
         """
@@ -232,32 +446,25 @@ class KedroProjectAnalyzer:
             "conf/base/logging.yml": "tiene_logging"
         }
         
+        if rutas is None:
+            rutas = self.listar_rutas(repo)
+        
         for archivo, key in archivos_verificar.items():
-            try:
-                repo.get_contents(archivo)
-                checks[key] = True
-            except:
-                pass
+            checks[key] = archivo in rutas
         
         # Verificar si hay tests
-        try:
-            tests = repo.get_contents("tests")
-            if tests:
-                checks["tiene_tests"] = True
-        except:
-            try:
-                src_tests = repo.get_contents("src/tests")
-                if src_tests:
-                    checks["tiene_tests"] = True
-            except:
-                pass
+        checks["tiene_tests"] = "tests" in rutas or "src/tests" in rutas
         
         return checks
     
-    def analizar_calidad_codigo(self, repo) -> Dict[str, Any]:
+    def analizar_calidad_codigo(self, repo, rutas: Optional[Set[str]] = None) -> Dict[str, Any]:
         """
         Analiza la calidad del código del proyecto.
         
+        Args:
+            repo: Repositorio de GitHub
+            rutas: Rutas del repositorio (se obtienen si no se entregan)
+        
         Returns:
             Métricas de calidad del código
         """
@@ -270,44 +477,45 @@ class KedroProjectAnalyzer:
             "archivos_analizados": []
         }
         
-        def analizar_archivo_python(contenido: str, nombre: str):
-            """Analiza un archivo Python individual."""
-            lineas = contenido.split('\n')
-            metricas["lineas_codigo"] += len(lineas)
-            
-            # Verificar docstrings
-            if '"""' in contenido or "'''" in contenido:
-                metricas["tiene_docstrings"] = True
-            
-            # Verificar type hints
-            if '->' in contenido or ': ' in contenido:
-                metricas["usa_type_hints"] = True
-            
-            metricas["archivos_analizados"].append(nombre)
+        if rutas is None:
+            rutas = self.listar_rutas(repo)
         
-        def explorar_directorio(path=""):
-            """Explora recursivamente el repositorio."""
+        # Analizar principalmente src/ y pipelines/
+        archivos_python = sorted(
+            ruta for ruta in rutas
+            if ruta.endswith('.py')
+            and ruta.split('/', 1)[0] in ('src', 'pipelines')
+            and not self.DIRECTORIOS_IGNORADOS.intersection(ruta.split('/')[:-1])
+        )
+        metricas["total_archivos_python"] = len(archivos_python)
+        
+        def analizar_archivo_python(ruta: str) -> Optional[Tuple[str, int, bool, bool]]:
+            """Descarga y analiza un archivo Python individual."""
             try:
-                contents = repo.get_contents(path)
-                if not isinstance(contents, list):
-                    contents = [contents]
-                
-                for content in contents:
-                    if content.type == "dir" and content.name not in ['.git', '__pycache__', '.venv', 'venv']:
-                        explorar_directorio(content.path)
-                    elif content.name.endswith('.py'):
-                        metricas["total_archivos_python"] += 1
-                        try:
-                            file_content = content.decoded_content.decode('utf-8')
-                            analizar_archivo_python(file_content, content.path)
-                        except:
-                            pass
-            except:
-                pass
+                # Se trabaja sobre los bytes: sin decodificar UTF-8 ni separar líneas
+                contenido = base64.b64decode(repo.get_contents(ruta).content)
+            except Exception:
+                return None
+            
+            return (
+                ruta,
+                contenido.count(b'\n') + 1,
+                b'"""' in contenido or b"'''" in contenido,
+                b'->' in contenido or b': ' in contenido
+            )
         
-        # Analizar principalmente src/ y pipelines/
-        for directorio in ['src', 'pipelines']:
-            explorar_directorio(directorio)
+        if not archivos_python:
+            return metricas
+        
+        workers = min(self.MAX_FETCH_WORKERS, len(archivos_python))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resultados = [r for r in executor.map(analizar_archivo_python, archivos_python) if r]
+        
+        for ruta, lineas, docstrings, type_hints in resultados:
+            metricas["lineas_codigo"] += lineas
+            metricas["tiene_docstrings"] = metricas["tiene_docstrings"] or docstrings
+            metricas["usa_type_hints"] = metricas["usa_type_hints"] or type_hints
+            metricas["archivos_analizados"].append(ruta)
         
         return metricas
 
@@ -324,7 +532,15 @@ class KedroEvaluator:
             ollama_client: Cliente de Ollama (opcional)
         """
         self.analyzer = KedroProjectAnalyzer(github_token, ollama_client)
-        self.rubrica = create_kedro_ml_rubrica()
+        self.rubrica = _RUBRICA_KEDRO
+        self._tipos_criterio = {c["nombre"]: _tipo_criterio(c["nombre"]) for c in self.rubrica["criterios"]}
+        self._evaluadores = {
+            "estructura": self._puntuar_estructura,
+            "catalogo": self._puntuar_catalogo,
+            "pipelines": self._puntuar_pipelines,
+            "documentacion": self._puntuar_documentacion,
+            "reproducibilidad": self._puntuar_reproducibilidad,
+        }
         self.github = Github(github_token)
         
     def evaluar_proyecto(self, 
@@ -350,15 +566,16 @@ class KedroEvaluator:
         # Obtener repositorio
         try:
             repo_name = repo_url.replace("https://github.com/", "").replace(".git", "")
-            repo = self.github.get_repo(repo_name)
+            repo = self.analyzer.abrir_repo(self.github.get_repo(repo_name))
         except GithubException as e:
             logger.error(f"Error accediendo al repositorio: {e}")
             return self._crear_evaluacion_error(repo_url, estudiante_nombre, str(e))
         
-        # Analizar estructura
-        estructura = self.analyzer.analizar_estructura_kedro(repo)
-        reproducibilidad = self.analyzer.verificar_reproducibilidad(repo)
-        calidad_codigo = self.analyzer.analizar_calidad_codigo(repo)
+        # Analizar estructura con un solo listado del árbol
+        rutas = self.analyzer.listar_rutas(repo)
+        estructura = self.analyzer.analizar_estructura_kedro(repo, rutas)
+        reproducibilidad = self.analyzer.verificar_reproducibilidad(repo, rutas)
+        calidad_codigo = self.analyzer.analizar_calidad_codigo(repo, rutas)
         
         # Evaluar cada criterio
         criterios_evaluados = []
@@ -419,84 +636,9 @@ class KedroEvaluator:
                          reproducibilidad: Dict, calidad: Dict, repo) -> Dict:
         """Evalúa un criterio individual."""
         nombre = criterio["nombre"]
-        puntuacion = 0
-        evidencias = []
-        retroalimentacion = ""
-        
-        # Lógica específica por criterio
-        if "Estructura y Configuración" in nombre:
-            if estructura["tiene_estructura_kedro"]:
-                puntuacion = 80
-                if len(estructura["errores"]) == 0:
-                    puntuacion = 100
-                elif len(estructura["errores"]) <= 2:
-                    puntuacion = 80
-            else:
-                puntuacion = 40 if len(estructura["directorios_principales"]) >= 2 else 20
-            
-            evidencias = estructura["directorios_principales"] + estructura["archivos_configuracion"]
-            retroalimentacion = f"Estructura {'completa' if puntuacion >= 80 else 'incompleta'}. "
-            if estructura["errores"]:
-                retroalimentacion += f"Problemas encontrados: {', '.join(estructura["errores"][:3])}"
-        
-        elif "Catálogo de Datos" in nombre:
-            num_datasets = estructura["datasets_configurados"]
-            if num_datasets >= 3:
-                puntuacion = 100 if num_datasets > 3 else 80
-            elif num_datasets == 2:
-                puntuacion = 60
-            elif num_datasets == 1:
-                puntuacion = 40
-            else:
-                puntuacion = 20
-            
-            evidencias = [f"{num_datasets} datasets configurados"]
-            retroalimentacion = f"Se encontraron {num_datasets} datasets. "
-            if num_datasets < 3:
-                retroalimentacion += f"Se requieren mínimo 3 datasets."
-        
-        elif "Pipelines" in nombre:
-            num_pipelines = len(estructura["pipelines_encontrados"])
-            if num_pipelines >= 3:
-                puntuacion = 100
-            elif num_pipelines == 2:
-                puntuacion = 80
-            elif num_pipelines == 1:
-                puntuacion = 60
-            else:
-                puntuacion = 20
-            
-            evidencias = estructura["pipelines_encontrados"]
-            retroalimentacion = f"Pipelines encontrados: {', '.join(estructura['pipelines_encontrados']) if estructura['pipelines_encontrados'] else 'ninguno'}"
-        
-        elif "Documentación" in nombre:
-            if reproducibilidad["tiene_readme"]:
-                puntuacion = 60
-                if len(estructura["notebooks_crisp_dm"]) >= 3:
-                    puntuacion = 100
-                elif len(estructura["notebooks_crisp_dm"]) >= 2:
-                    puntuacion = 80
-            else:
-                puntuacion = 20
-            
-            evidencias = estructura["notebooks_crisp_dm"]
-            retroalimentacion = f"Notebooks CRISP-DM: {len(estructura['notebooks_crisp_dm'])}/3"
-        
-        elif "Reproducibilidad" in nombre:
-            checks_pasados = sum(1 for v in reproducibilidad.values() if v)
-            total_checks = len(reproducibilidad)
-            puntuacion = int((checks_pasados / total_checks) * 100)
-            
-            evidencias = [k for k, v in reproducibilidad.items() if v]
-            retroalimentacion = f"Verificaciones de reproducibilidad: {checks_pasados}/{total_checks}"
-        
-        else:
-            # Evaluación genérica basada en estructura
-            if estructura["tiene_estructura_kedro"]:
-                puntuacion = 60
-            else:
-                puntuacion = 40
-            retroalimentacion = "Evaluación basada en estructura general"
+        tipo = self._tipos_criterio.get(nombre) or _tipo_criterio(nombre)
+        evaluador = self._evaluadores.get(tipo, self._puntuar_generico)
+        puntuacion, evidencias, retroalimentacion = evaluador(estructura, reproducibilidad, calidad)
         
         # Calcular puntuación ponderada
         puntuacion_ponderada = puntuacion * criterio["ponderacion"]
@@ -511,18 +653,96 @@ class KedroEvaluator:
             "retroalimentacion": retroalimentacion
         }
     
+    def _puntuar_estructura(self, estructura: Dict, reproducibilidad: Dict,
+                            calidad: Dict) -> Tuple[int, List[str], str]:
+        """Puntúa la estructura y configuración del proyecto."""
+        if estructura["tiene_estructura_kedro"]:
+            puntuacion = 80
+            if len(estructura["errores"]) == 0:
+                puntuacion = 100
+            elif len(estructura["errores"]) <= 2:
+                puntuacion = 80
+        else:
+            puntuacion = 40 if len(estructura["directorios_principales"]) >= 2 else 20
+        
+        evidencias = estructura["directorios_principales"] + estructura["archivos_configuracion"]
+        retroalimentacion = f"Estructura {'completa' if puntuacion >= 80 else 'incompleta'}. "
+        if estructura["errores"]:
+            retroalimentacion += f"Problemas encontrados: {', '.join(estructura['errores'][:3])}"
+        return puntuacion, evidencias, retroalimentacion
+    
+    def _puntuar_catalogo(self, estructura: Dict, reproducibilidad: Dict,
+                          calidad: Dict) -> Tuple[int, List[str], str]:
+        """Puntúa el catálogo de datos según los datasets configurados."""
+        num_datasets = estructura["datasets_configurados"]
+        if num_datasets >= 3:
+            puntuacion = 100 if num_datasets > 3 else 80
+        elif num_datasets == 2:
+            puntuacion = 60
+        elif num_datasets == 1:
+            puntuacion = 40
+        else:
+            puntuacion = 20
+        
+        evidencias = [f"{num_datasets} datasets configurados"]
+        retroalimentacion = f"Se encontraron {num_datasets} datasets. "
+        if num_datasets < 3:
+            retroalimentacion += "Se requieren mínimo 3 datasets."
+        return puntuacion, evidencias, retroalimentacion
+    
+    def _puntuar_pipelines(self, estructura: Dict, reproducibilidad: Dict,
+                           calidad: Dict) -> Tuple[int, List[str], str]:
+        """Puntúa según la cantidad de pipelines encontrados."""
+        num_pipelines = len(estructura["pipelines_encontrados"])
+        if num_pipelines >= 3:
+            puntuacion = 100
+        elif num_pipelines == 2:
+            puntuacion = 80
+        elif num_pipelines == 1:
+            puntuacion = 60
+        else:
+            puntuacion = 20
+        
+        evidencias = estructura["pipelines_encontrados"]
+        retroalimentacion = f"Pipelines encontrados: {', '.join(estructura['pipelines_encontrados']) if estructura['pipelines_encontrados'] else 'ninguno'}"
+        return puntuacion, evidencias, retroalimentacion
+    
+    def _puntuar_documentacion(self, estructura: Dict, reproducibilidad: Dict,
+                               calidad: Dict) -> Tuple[int, List[str], str]:
+        """Puntúa el README y los notebooks CRISP-DM."""
+        if reproducibilidad["tiene_readme"]:
+            puntuacion = 60
+            if len(estructura["notebooks_crisp_dm"]) >= 3:
+                puntuacion = 100
+            elif len(estructura["notebooks_crisp_dm"]) >= 2:
+                puntuacion = 80
+        else:
+            puntuacion = 20
+        
+        evidencias = estructura["notebooks_crisp_dm"]
+        retroalimentacion = f"Notebooks CRISP-DM: {len(estructura['notebooks_crisp_dm'])}/3"
+        return puntuacion, evidencias, retroalimentacion
+    
+    def _puntuar_reproducibilidad(self, estructura: Dict, reproducibilidad: Dict,
+                                  calidad: Dict) -> Tuple[int, List[str], str]:
+        """Puntúa la proporción de verificaciones de reproducibilidad cumplidas."""
+        checks_pasados = sum(1 for v in reproducibilidad.values() if v)
+        total_checks = len(reproducibilidad)
+        puntuacion = int((checks_pasados / total_checks) * 100)
+        
+        evidencias = [k for k, v in reproducibilidad.items() if v]
+        retroalimentacion = f"Verificaciones de reproducibilidad: {checks_pasados}/{total_checks}"
+        return puntuacion, evidencias, retroalimentacion
+    
+    def _puntuar_generico(self, estructura: Dict, reproducibilidad: Dict,
+                          calidad: Dict) -> Tuple[int, List[str], str]:
+        """Evaluación genérica basada en estructura."""
+        puntuacion = 60 if estructura["tiene_estructura_kedro"] else 40
+        return puntuacion, [], "Evaluación basada en estructura general"
+    
     def _porcentaje_a_nota_chilena(self, porcentaje: float) -> float:
         """Convierte porcentaje a nota chilena."""
-        escala = [
-            (100, 7.0), (90, 6.5), (80, 6.0), (70, 5.5),
-            (60, 5.0), (50, 4.5), (40, 4.0), (30, 3.5),
-            (20, 3.0), (10, 2.0), (0, 1.0)
-        ]
-        
-        for umbral, nota in escala:
-            if porcentaje >= umbral:
-                return nota
-        return 1.0
+        return _porcentaje_a_nota(porcentaje)
     
     def _calcular_bonificaciones(self, estructura: Dict, reproducibilidad: Dict) -> Dict[str, float]:
         """Calcula bonificaciones según extras implementados."""
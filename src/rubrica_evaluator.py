@@ -48,9 +48,10 @@ class EvaluacionCompleta:
 class GitHubAnalyzer:
     """Analizador de repositorios de GitHub."""
     
-    def __init__(self, github_token: str):
+    def __init__(self, github_token: str, pool_size: Optional[int] = None):
         from github import Auth
-        self.github = Github(auth=Auth.Token(github_token))
+        # PyGithub mantiene su propia sesión keep-alive; pool_size la ajusta a los hilos que la comparten
+        self.github = Github(auth=Auth.Token(github_token), pool_size=pool_size)
         
     def get_repository_structure(self, repo_url: str) -> Dict[str, Any]:
         """Obtiene la estructura completa del repositorio."""
@@ -98,6 +99,16 @@ class GitHubAnalyzer:
         get_contents()
         return structure
 
+    def get_head_sha(self, repo_url: str) -> Optional[str]:
+        """Obtiene el SHA del último commit de la rama por defecto."""
+        try:
+            repo_name = repo_url.replace("https://github.com/", "").replace(".git", "")
+            repo = self.github.get_repo(repo_name)
+            return repo.get_branch(repo.default_branch).commit.sha
+        except Exception as e:
+            print(f"Error obteniendo el último commit de {repo_url}: {e}")
+            return None
+
     def get_file_content(self, repo_url: str, file_path: str) -> Optional[str]:
         """Obtiene el contenido de un archivo específico."""
         try:
@@ -112,9 +123,11 @@ class GitHubAnalyzer:
 class LLMEvaluator:
     """Evaluador usando diferentes modelos de LLM."""
     
-    def __init__(self, provider: str = "github", api_key: str = None):
+    def __init__(self, provider: str = "github", api_key: str = None, session: Optional[requests.Session] = None):
         self.provider = provider
         self.api_key = api_key
+        # Sesión compartida: las llamadas HTTP a Ollama reutilizan conexiones keep-alive
+        self.session = session or requests.Session()
         self.setup_client()
         
     def setup_client(self):
@@ -178,7 +191,7 @@ class LLMEvaluator:
                     }
                 }
                 
-                response = requests.post(
+                response = self.session.post(
                     f"{self.ollama_url}/api/generate",
                     json=ollama_payload,
                     timeout=120
@@ -371,9 +384,10 @@ IMPORTANTE:
 class RubricaEvaluator:
     """Sistema principal de evaluación con rúbricas."""
     
-    def __init__(self, github_token: str, llm_provider: str = "github", llm_api_key: str = None, use_advanced: bool = False):
-        self.github_analyzer = GitHubAnalyzer(github_token)
-        self.llm_evaluator = LLMEvaluator(llm_provider, llm_api_key)
+    def __init__(self, github_token: str, llm_provider: str = "github", llm_api_key: str = None, use_advanced: bool = False,
+                 session: Optional[requests.Session] = None, pool_size: Optional[int] = None):
+        self.github_analyzer = GitHubAnalyzer(github_token, pool_size=pool_size)
+        self.llm_evaluator = LLMEvaluator(llm_provider, llm_api_key, session=session)
         self.use_advanced = use_advanced
         
         if use_advanced:
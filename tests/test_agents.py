@@ -0,0 +1,282 @@
+# Tests para los agentes inteligentes
+import unittest
+import sys
+import os
+import json
+import copy
+import pickle
+import tempfile
+from unittest.mock import MagicMock, patch
+import httpx
+
+# Agregar src al path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from agents.analysis_agent import AnalysisAgent, EvaluationInsight
+from agents.prompt_cache import PromptCache
+from agents.monitoring_agent import MonitoringAgent
+from agents.planning_agent import PlanningAgent, _JsonStreamScanner
+from agents.recommendation_agent import RecommendationAgent
+from config import Config
+
+_cache_patch = patch.object(Config, 'USE_CACHE', False)
+
+def setUpModule():
+    """Los agentes creados en los tests no abren la caché en disco ni reutilizan respuestas de otras corridas."""
+    _cache_patch.start()
+
+def tearDownModule():
+    _cache_patch.stop()
+
+class TestAnalysisAgentParsing(unittest.TestCase):
+    """Tests para el parseo de respuestas del agente de análisis."""
+
+    def setUp(self):
+        """Crea el agente sin inicializar clientes LLM."""
+        self.agent = AnalysisAgent.__new__(AnalysisAgent)
+
+    def test_parse_insights_ignora_corchetes_sueltos(self):
+        """Test que corchetes fuera del JSON no rompen el parseo."""
+        respuesta = '''Revisa la lista [ver abajo]:
+```json
+[{"tipo": "tendencia", "titulo": "EDA débil", "descripcion": "...",
+  "criterios_afectados": ["EDA"], "gravedad": "alta", "evidencias": []}]
+```
+Nota final [opcional].'''
+
+        insights = self.agent._parse_insights(respuesta)
+
+        self.assertEqual(len(insights), 1)
+        self.assertIsInstance(insights[0], EvaluationInsight)
+        self.assertEqual(insights[0].titulo, "EDA débil")
+        self.assertEqual(insights[0].criterios_afectados, ["EDA"])
+
+    def test_parse_insights_sin_json(self):
+        """Test que una respuesta sin JSON devuelve lista vacía."""
+        self.assertEqual(self.agent._parse_insights("Sin datos [pendiente]"), [])
+
+    def test_insight_copia_y_pickle(self):
+        """Test que los insights congelados sobreviven a copy, deepcopy y pickle."""
+        insight = EvaluationInsight("tendencia", "EDA débil", "...", ["EDA"], "alta", ["3 de 5"])
+
+        for copia in (copy.copy(insight), copy.deepcopy(insight), pickle.loads(pickle.dumps(insight))):
+            self.assertEqual(copia, insight)
+        self.assertIsNot(copy.deepcopy(insight).evidencias, insight.evidencias)
+
+    def test_parse_message_insights_tool_call(self):
+        """Test que los argumentos de emit_insights se convierten en insights."""
+        message = MagicMock()
+        message.tool_calls[0].function.arguments = (
+            '{"insights": [{"tipo": "problema_comun", "titulo": "Sin tests", '
+            '"descripcion": "...", "criterios_afectados": [], "gravedad": "media", '
+            '"evidencias": ["80% sin tests"]}]}'
+        )
+
+        insights = self.agent._parse_message_insights(message)
+
+        self.assertEqual(len(insights), 1)
+        self.assertEqual(insights[0].tipo, "problema_comun")
+        self.assertEqual(insights[0].evidencias, ["80% sin tests"])
+
+class TestPlanningAgentParsing(unittest.TestCase):
+    """Tests para el parseo de planes del agente de planificación."""
+
+    def setUp(self):
+        """Crea el agente sin inicializar clientes LLM."""
+        self.agent = PlanningAgent.__new__(PlanningAgent)
+
+    def test_parse_batch_plans_omite_criterios_faltantes(self):
+        """Test que un lote parcial solo devuelve los criterios con plan válido."""
+        respuesta = '{"planes": {"EDA": {"objetivos": ["Explorar datos"], "tiempo_estimado": 20}, "Modelado": "n/a"}}'
+
+        plans = self.agent._parse_batch_plans(respuesta, ["EDA", "Modelado", "Testing"])
+
+        self.assertEqual(list(plans), ["EDA"])
+        self.assertEqual(plans["EDA"].objetivos, ["Explorar datos"])
+        self.assertEqual(plans["EDA"].tiempo_estimado, 20)
+
+    def test_stream_scanner_ignora_llaves_en_prosa(self):
+        """Test que llaves en el texto previo no cierran el stream antes del plan."""
+        scanner = _JsonStreamScanner()
+        chunks = ['Plan para {EDA}: ', '{"objetivos": ["Explorar datos"], ', '"tiempo_estimado": 20}', ' fin']
+
+        cerrado = [scanner.feed(chunk) for chunk in chunks[:3]]
+        plan = self.agent._parse_evaluation_plan(scanner.text, "EDA")
+
+        self.assertEqual(cerrado, [False, False, True])
+        self.assertEqual(plan.objetivos, ["Explorar datos"])
+        self.assertEqual(plan.tiempo_estimado, 20)
+
+class TestPromptCache(unittest.TestCase):
+    """Tests para la caché persistente de respuestas."""
+
+    def test_roundtrip_y_persistencia(self):
+        """Test que una respuesta guardada sobrevive a reabrir la caché."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "prompts.sqlite")
+            key = PromptCache.make_key("github", "gpt-4o-mini", "prompt")
+
+            cache = PromptCache(path=path, enabled=True)
+            self.assertIsNone(cache.get(key))
+            cache.set(key, "respuesta")
+
+            self.assertEqual(PromptCache(path=path, enabled=True).get(key), "respuesta")
+
+    def test_entrada_expirada(self):
+        """Test que una entrada con ttl vencido ya no se devuelve."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PromptCache(path=os.path.join(tmp, "prompts.sqlite"), enabled=True)
+            cache.set("vigente", "a", ttl=60)
+            cache.set("vencida", "b", ttl=-1)
+
+            self.assertEqual(cache.get("vigente"), "a")
+            self.assertIsNone(cache.get("vencida"))
+
+    def test_cache_deshabilitada(self):
+        """Test que la caché deshabilitada nunca devuelve resultados."""
+        cache = PromptCache(enabled=False)
+        cache.set("clave", "valor")
+        self.assertIsNone(cache.get("clave"))
+
+class TestMonitoringAgent(unittest.TestCase):
+    """Tests para el agente de monitoreo."""
+
+    def setUp(self):
+        """Crea el agente con Ollama para no inicializar clientes remotos."""
+        with patch('agents.monitoring_agent.Config.LLM_PROVIDER', 'ollama'):
+            self.agent = MonitoringAgent()
+
+    def test_detecta_retroalimentaciones_similares(self):
+        """Test que retroalimentaciones casi idénticas generan alerta de plagio."""
+        texto = "El modelo usa random forest con validación cruzada y buena documentación"
+        evaluaciones = [
+            {"estudiante": "Ana", "criterios": [{"criterio": "Modelado", "retroalimentacion": texto}]},
+            {"estudiante": "Luis", "criterios": [{"criterio": "Modelado", "retroalimentacion": texto}]},
+            {"estudiante": "Eva", "criterios": [{"criterio": "Modelado", "retroalimentacion": "Sin modelo"}]}
+        ]
+
+        alerts = self.agent._detect_plagiarism_patterns(evaluaciones)
+
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0].tipo, "plagio")
+        self.assertEqual(alerts[0].estudiante, "Ana y Luis")
+
+    def test_similitud_ignora_puntuacion_y_palabras_vacias(self):
+        """Test que la puntuación y las palabras vacías no ocultan textos copiados."""
+        evaluaciones = [
+            {"estudiante": "Ana", "criterios": [{"criterio": "EDA", "retroalimentacion": "Buen análisis exploratorio, gráficos claros."}]},
+            {"estudiante": "Luis", "criterios": [{"criterio": "EDA", "retroalimentacion": "buen análisis exploratorio y gráficos claros"}]}
+        ]
+
+        alerts = self.agent._detect_plagiarism_patterns(evaluaciones)
+
+        self.assertEqual(len(alerts), 1)
+
+    def test_monitor_student_progress_tendencia(self):
+        """Test que el progreso ordena por fecha y detecta mejora."""
+        evaluaciones = [
+            {"estudiante": "Ana", "nota_final": 3.0, "fecha_evaluacion": "2024-01-10"},
+            {"estudiante": "Ana", "nota_final": 6.0, "fecha_evaluacion": "2024-03-10"},
+            {"estudiante": "Ana", "nota_final": 4.5, "fecha_evaluacion": "2024-02-10"}
+        ]
+
+        progress = self.agent.monitor_student_progress(evaluaciones)
+
+        self.assertEqual(progress.tendencia, "mejorando")
+        self.assertAlmostEqual(progress.nota_promedio, 4.5)
+        self.assertEqual(progress.evaluaciones[0]["fecha_evaluacion"], "2024-03-10")
+
+    def test_umbrales_con_notas_de_un_decimal(self):
+        """Test que diferencias justo en los umbrales (0.2 y 1.0) se comparan como en float64."""
+        progreso = self.agent.monitor_student_progress([
+            {"estudiante": "Ana", "nota_final": 4.0, "fecha_evaluacion": "2024-01-10"},
+            {"estudiante": "Ana", "nota_final": 4.2, "fecha_evaluacion": "2024-02-10"}
+        ])
+        self.assertEqual(progreso.tendencia, "mejorando")
+
+        alertas = self.agent._analyze_student_alerts("luis", [
+            {"estudiante": "Luis", "nota_final": 4.0, "fecha_evaluacion": "2024-02-10"},
+            {"estudiante": "Luis", "nota_final": 5.0, "fecha_evaluacion": "2024-01-10"}
+        ])
+        self.assertNotIn("Degradación rápida en el rendimiento", [a.titulo for a in alertas])
+
+    def test_chat_reutiliza_respuesta_cacheada(self):
+        """Test que un prompt repetido no vuelve a llamar al LLM."""
+        self.agent.cache = PromptCache(enabled=False)
+        self.agent.client = MagicMock()
+        self.agent.client.chat.completions.create.return_value.choices[0].message.content = "ok"
+        messages = [{"role": "user", "content": "Resume el progreso de Ana"}]
+
+        self.assertEqual(self.agent._chat(messages, temperature=0), "ok")
+        self.assertEqual(self.agent._chat(messages, temperature=0), "ok")
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 1)
+
+    def test_chat_no_cachea_respuesta_vacia_y_acota_memoria(self):
+        """Test que una respuesta None se reintenta y la memoria no pasa del límite."""
+        self.agent.cache = PromptCache(enabled=False)
+        self.agent.client = MagicMock()
+        completions = self.agent.client.chat.completions.create
+        completions.return_value.choices[0].message.content = None
+        messages = [{"role": "user", "content": "Resume el progreso de Ana"}]
+
+        self.assertIsNone(self.agent._chat(messages))
+        self.assertIsNone(self.agent._chat(messages))
+        self.assertEqual(completions.call_count, 2)
+
+        completions.return_value.choices[0].message.content = "ok"
+        for i in range(MonitoringAgent.RESPONSE_MEMO_SIZE + 5):
+            self.agent._chat([{"role": "user", "content": f"prompt {i}"}])
+        self.assertEqual(len(self.agent._llm_cache), MonitoringAgent.RESPONSE_MEMO_SIZE)
+
+class TestRecommendationAgent(unittest.TestCase):
+    """Tests para el agente de recomendaciones."""
+
+    def setUp(self):
+        """Crea el agente con Ollama para no inicializar clientes remotos."""
+        with patch('agents.recommendation_agent.Config.LLM_PROVIDER', 'ollama'):
+            self.agent = RecommendationAgent()
+        self.agent.cache = PromptCache(enabled=False)
+
+    def test_parse_recommendations_ignora_texto_alrededor(self):
+        """Test que corchetes en el texto y prosa final no rompen el parseo."""
+        respuesta = '''Revisa la lista [ver abajo]:
+[{"titulo": "Agregar tests", "prioridad": "alta", "pasos": ["Crear tests/"]}]
+Nota final [opcional].'''
+
+        recomendaciones = self.agent._parse_recommendations(respuesta)
+
+        self.assertEqual(len(recomendaciones), 1)
+        self.assertEqual(recomendaciones[0].titulo, "Agregar tests")
+        self.assertEqual(recomendaciones[0].pasos, ["Crear tests/"])
+
+    def test_message_text_tool_call(self):
+        """Test que los argumentos de emit_recommendations se convierten en recomendaciones."""
+        message = MagicMock()
+        message.tool_calls[0].function.arguments = (
+            '{"recomendaciones": [{"titulo": "Agregar tests", "descripcion": "...", '
+            '"prioridad": "alta", "tiempo_estimado": "2 horas", "recursos": [], '
+            '"pasos": ["Crear tests/"], "criterio_relacionado": "Testing", "nivel_dificultad": "intermedio"}]}'
+        )
+
+        recomendaciones = self.agent._parse_recommendations(self.agent._message_text(message))
+
+        self.assertEqual(len(recomendaciones), 1)
+        self.assertEqual(recomendaciones[0].prioridad, "alta")
+        self.assertEqual(recomendaciones[0].pasos, ["Crear tests/"])
+
+    def test_generate_batch_mantiene_orden(self):
+        """Test que el lote devuelve las recomendaciones en el orden de entrada."""
+        def handler(request):
+            prompt = json.loads(request.content)["prompt"]
+            titulo = "EDA" if '"nota_final": 3.0' in prompt else "Tests"
+            return httpx.Response(200, json={"response": json.dumps([{"titulo": titulo, "prioridad": "alta"}])})
+
+        transport = httpx.MockTransport(handler)
+        self.agent._create_async_client = lambda: httpx.AsyncClient(transport=transport)
+
+        resultados = self.agent.generate_batch([({"nota_final": 3.0}, None), ({"nota_final": 5.0}, None)])
+
+        self.assertEqual([[r.titulo for r in recs] for recs in resultados], [["EDA"], ["Tests"]])
+
+if __name__ == '__main__':
+    unittest.main()
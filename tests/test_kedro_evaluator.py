@@ -0,0 +1,65 @@
+# Tests para el análisis de proyectos Kedro
+import unittest
+import sys
+import os
+import yaml
+
+# Agregar src y la raíz del proyecto al path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from kedro_evaluator import KedroProjectAnalyzer
+
+def _contar_con_yaml(catalog_content):
+    """Conteo de referencia usando el parser completo."""
+    try:
+        catalog = yaml.safe_load(catalog_content)
+        if catalog:
+            return len([k for k in catalog.keys()
+                        if not k.startswith('_') and isinstance(catalog[k], dict)])
+    except Exception:
+        pass
+    return 0
+
+class TestContarDatasets(unittest.TestCase):
+    """Tests para el conteo rápido de datasets del catálogo."""
+
+    def setUp(self):
+        """Crea el analizador sin conectarse a GitHub."""
+        self.analyzer = KedroProjectAnalyzer.__new__(KedroProjectAnalyzer)
+
+    def test_rapido_coincide_con_yaml(self):
+        """Test que el conteo rápido da lo mismo que el parser en catálogos válidos."""
+        catalogos = [
+            "companies:\n  type: pandas.CSVDataset\n  filepath: data/01_raw/companies.csv\n",
+            ("_csv: &csv\n  type: pandas.CSVDataset\n  load_args:\n    sep: ','\n\n"
+             "# Datos crudos\nshuttles:\n  <<: *csv\n  filepath: data/01_raw/shuttles.csv # origen\n"
+             "model_input_table:\n  type: pandas.ParquetDataset\n  filepath: data/03_primary/mit.pq\n"
+             "  versioned: true\n"),
+            "a:\n    type: x\na:\n    type: y\n",
+        ]
+        for catalogo in catalogos:
+            with self.subTest(catalogo=catalogo):
+                rapido = KedroProjectAnalyzer._contar_datasets_rapido(catalogo)
+                self.assertIsNotNone(rapido)
+                self.assertEqual(rapido, _contar_con_yaml(catalogo))
+
+    def test_yaml_invalido_o_claves_no_texto_usan_parser(self):
+        """Test que YAML inválido y claves como "on" o "null" no pasan por el conteo rápido."""
+        catalogos = [
+            "ds:\n  type: x\n  - a\n",
+            "ds:\n  type: x\n  filepath: a: b\n",
+            "ds:\n  type: x\n    filepath: a\n",
+            "ds:#c\n  type: x\n",
+            "ds: &d\n  type: x\nds2: &d\n  type: y\n",
+            "on:\n  type: x\n",
+            "yes:\n  type: x\n",
+            "null:\n  type: x\n",
+        ]
+        for catalogo in catalogos:
+            with self.subTest(catalogo=catalogo):
+                self.assertIsNone(KedroProjectAnalyzer._contar_datasets_rapido(catalogo))
+                self.assertEqual(self.analyzer._contar_datasets(catalogo), _contar_con_yaml(catalogo))
+
+if __name__ == '__main__':
+    unittest.main()